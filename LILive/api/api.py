@@ -1,19 +1,52 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import graphene
-from graphene import ObjectType, String, List, Float
+from graphene import ObjectType, String, List, Float, Boolean
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from collections import defaultdict
+import base64
+import json
+import os
+import time
+
+# Sensors are queried concurrently through one shared client; the pool size
+# bounds how many queries are in flight. Each sensor stops paging once its
+# query has run for DYNAMO_QUERY_TIMEOUT seconds and returns the rows read so
+# far with a cursor, so it holds a pool thread for at most about twice that
+# (the deadline plus the page request in flight, retries included).
+DYNAMO_MAX_CONCURRENCY = int(os.environ.get("DYNAMO_MAX_CONCURRENCY", "16"))
+DYNAMO_QUERY_TIMEOUT = float(os.environ.get("DYNAMO_QUERY_TIMEOUT", "5"))
+# Attempts per page request (the first one plus retries), which share the timeout
+DYNAMO_MAX_ATTEMPTS = int(os.environ.get("DYNAMO_MAX_ATTEMPTS", "2"))
+# Each query page is at most 1 MB, so this caps the data read per sensor per
+# request. Sensors with more data return a cursor to fetch the next pages.
+DYNAMO_PAGE_BUDGET = int(os.environ.get("DYNAMO_PAGE_BUDGET", "10"))
+# Set to e.g. http://localhost:8000 to run against DynamoDB Local
+DYNAMO_ENDPOINT_URL = os.environ.get("DYNAMO_ENDPOINT_URL")
 
 try:
-    dynamodb = boto3.client("dynamodb", region_name="us-east-1")
+    dynamodb = boto3.client(
+        "dynamodb",
+        region_name="us-east-1",
+        endpoint_url=DYNAMO_ENDPOINT_URL,
+        config=Config(
+            max_pool_connections=DYNAMO_MAX_CONCURRENCY,
+            connect_timeout=DYNAMO_QUERY_TIMEOUT / DYNAMO_MAX_ATTEMPTS,
+            read_timeout=DYNAMO_QUERY_TIMEOUT / DYNAMO_MAX_ATTEMPTS,
+            retries={"total_max_attempts": DYNAMO_MAX_ATTEMPTS, "mode": "standard"},
+        ),
+    )
     print("Successfully connected to DynamoDB.")
 except ClientError as e:
     print(f"Error connecting to DynamoDB: {e}")
     dynamodb = None
 
+dynamo_pool = ThreadPoolExecutor(max_workers=DYNAMO_MAX_CONCURRENCY)
+
 # --- In-Memory Graph Data ---
 IN_MEMORY_GRAPH = {
     "Pump Station": {
@@ -40,10 +73,12 @@ class Measurement(ObjectType):
 
 
 class MeasurementGroup(ObjectType):
-    name, unit, values = (
+    name, unit, values, has_more, cursor = (
         String(required=True),
         String(),
         List(Measurement, required=True),
+        Boolean(required=True),
+        String(),
     )
 
 
@@ -86,13 +121,14 @@ class Query(ObjectType):
         space=String(required=True),
         start_date=String(required=True),
         end_date=String(required=True),
+        cursor=String(),
     )
     tree = graphene.Field(TreeNode, root_node=String(required=True))
 
     def resolve_tree(self, info, root_node):
         return build_in_memory_tree(root_node)
 
-    def resolve_spaces(self, info, space, start_date, end_date):
+    def resolve_spaces(self, info, space, start_date, end_date, cursor=None):
         if not dynamodb or not (descendants := get_all_descendants(space)):
             return []
 
@@ -124,9 +160,16 @@ class Query(ObjectType):
                 ]
             )
 
-        measurements = get_sensor_measurements_from_dynamo(
-            sensors, iso_to_ts(start_date), iso_to_ts(end_date)
+        # A cursor resumes only the sensors that had more data, from where they left off
+        start_keys = decode_cursor(cursor) if cursor else {}
+        measurements, errors, last_keys = get_sensor_measurements_from_dynamo(
+            [s for s in sensors if not cursor or s["sensorId"] in start_keys],
+            iso_to_ts(start_date),
+            iso_to_ts(end_date),
+            start_keys,
         )
+        # Failed sensors don't fail the query, they are reported in "errors"
+        info.context.setdefault("errors", []).extend(errors)
 
         # Using defaultdict for automatic and concise nested grouping
         spaces_data = defaultdict(
@@ -176,6 +219,8 @@ class Query(ObjectType):
                         name=m_type,
                         unit=get_unit(m_type),
                         values=[Measurement(**val) for val in vals],
+                        has_more=bool(pending := pending_keys(vals, last_keys)),
+                        cursor=encode_cursor(pending) if pending else None,
                     )
                     for m_type, vals in data["measurements"].items()
                 ],
@@ -212,41 +257,102 @@ def get_all_descendants(start_node, visited=None):
     return visited
 
 
-def get_sensor_measurements_from_dynamo(sensors, start_ts, end_ts):
+# Follows LastEvaluatedKey so windows with more than 1 MB of data aren't truncated
+def paginate_sensor_query(sensor_id, start_ts, end_ts, start_key=None, deadline=None):
+    params = {
+        "TableName": "sensor-data",
+        "KeyConditionExpression": "#pk = :sid AND #sk BETWEEN :start AND :end",
+        "ExpressionAttributeNames": {"#pk": "partKey", "#sk": "sortKey"},
+        "ExpressionAttributeValues": {
+            ":sid": {"S": sensor_id},
+            ":start": {"N": start_ts},
+            ":end": {"N": end_ts},
+        },
+    }
+    for _ in range(DYNAMO_PAGE_BUDGET):
+        if start_key:
+            params["ExclusiveStartKey"] = start_key
+        page = dynamodb.query(**params)
+        yield page
+        if not (start_key := page.get("LastEvaluatedKey")):
+            return
+        if deadline is not None and time.monotonic() >= deadline:
+            # Out of time, the LastEvaluatedKey of this page is the cursor
+            return
+
+
+def decode_measurements(sensor, items):
+    for item in items:
+        print(item)
+        m = {
+            "spaceName": sensor["spaceName"],
+            "sensor_id": item["partKey"]["S"],
+            "timestamp": item["sortKey"]["N"],
+        }
+        m.update(
+            {
+                k: float(v["N"])
+                for k, v in item.items()
+                if k not in ["partKey", "sortKey"] and "N" in v
+            }
+        )
+        yield m
+
+
+def query_sensor(sensor, start_ts, end_ts, start_key=None):
+    deadline = time.monotonic() + DYNAMO_QUERY_TIMEOUT
+    measurements, last_key = [], None
+    pages = paginate_sensor_query(
+        sensor["sensorId"], start_ts, end_ts, start_key, deadline
+    )
+    for page in pages:
+        measurements.extend(decode_measurements(sensor, page.get("Items", [])))
+        last_key = page.get("LastEvaluatedKey")
+    # last_key is only set if the page budget or the deadline ran out before
+    # the end of the window
+    return measurements, last_key
+
+
+def get_sensor_measurements_from_dynamo(sensors, start_ts, end_ts, start_keys=None):
     print(sensors)
     print(start_ts, end_ts)
-    all_measurements = []
-    for sensor in sensors:
-        try:
-            res = dynamodb.query(
-                TableName="sensor-data",
-                KeyConditionExpression="#pk = :sid AND #sk BETWEEN :start AND :end",
-                ExpressionAttributeNames={"#pk": "partKey", "#sk": "sortKey"},
-                ExpressionAttributeValues={
-                    ":sid": {"S": sensor["sensorId"]},
-                    ":start": {"N": start_ts},
-                    ":end": {"N": end_ts},
-                },
-            )
-            for item in res.get("Items", []):
-                print(item)
-                m = {
-                    "spaceName": sensor["spaceName"],
-                    "sensor_id": item["partKey"]["S"],
-                    "timestamp": item["sortKey"]["N"],
-                }
-                m.update(
-                    {
-                        k: float(v["N"])
-                        for k, v in item.items()
-                        if k not in ["partKey", "sortKey"] and "N" in v
-                    }
-                )
-                all_measurements.append(m)
-        except Exception as e:
+    start_keys = start_keys or {}
+    futures = {
+        dynamo_pool.submit(
+            query_sensor, s, start_ts, end_ts, start_keys.get(s["sensorId"])
+        ): s
+        for s in sensors
+    }
+    # Every query stops at its own deadline (see query_sensor), so waiting for
+    # the results is bounded too
+    all_measurements, errors, last_keys = [], [], {}
+    for future, sensor in futures.items():
+        if e := future.exception():
             print(f"Dynamo Error: {e}")
+            errors.append(f"Error querying sensor {sensor['sensorId']}: {e}")
+        else:
+            measurements, last_key = future.result()
+            all_measurements.extend(measurements)
+            if last_key:
+                last_keys[sensor["sensorId"]] = last_key
     print(all_measurements)
-    return all_measurements
+    return all_measurements, errors, last_keys
+
+
+def pending_keys(values, last_keys):
+    return {
+        sid: last_keys[sid]
+        for sid in {v["sensor_id"] for v in values}
+        if sid in last_keys
+    }
+
+
+def encode_cursor(last_keys):
+    return base64.urlsafe_b64encode(json.dumps(last_keys).encode()).decode()
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
 
 
 def iso_to_ts(iso_str):
@@ -275,11 +381,13 @@ schema = graphene.Schema(query=Query)
 @app.route("/graphql", methods=["POST"])
 def graphql_server():
     data = request.get_json()
-    result = schema.execute(data.get("query"), variables=data.get("variables"))
+    context = {"errors": []}
+    result = schema.execute(
+        data.get("query"), variables=data.get("variables"), context_value=context
+    )
+    errors = [str(e) for e in result.errors or []] + context["errors"]
     return jsonify(
-        {"data": result.data, "errors": [str(e) for e in result.errors]}
-        if result.errors
-        else {"data": result.data}
+        {"data": result.data, "errors": errors} if errors else {"data": result.data}
     ), (400 if result.errors else 200)
 
 
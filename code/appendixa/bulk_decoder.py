@@ -0,0 +1,125 @@
+import base64
+
+import numpy as np
+
+from message_decoder import SENSOR_DECODERS, decode_lht52, decode_lwl02
+
+# Payload layouts as NumPy structured dtypes, so a whole batch of frames is
+# read with a single np.frombuffer call. NumPy has no 3-byte integer type,
+# so 3-byte big-endian fields are read as 3 unsigned bytes and combined.
+LHT52_DTYPE = np.dtype([("temperature", ">i2"), ("humidity", ">u2")])
+LWL02_DTYPE = np.dtype(
+    [
+        ("status_bat", ">u2"),
+        ("mode", "u1"),
+        ("total_events", "u1", (3,)),
+        ("last_duration", "u1", (3,)),
+        ("alarm", "u1"),
+    ]
+)
+
+
+def uint24(raw):
+    """Combines an (n, 3) array of big-endian bytes into uint32 values."""
+    raw = raw.astype(np.uint32)
+    return (raw[:, 0] << 16) | (raw[:, 1] << 8) | raw[:, 2]
+
+
+B64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+# Base64 character -> 6-bit value, padding decodes as 0 and anything else as -1
+B64_LOOKUP = np.full(256, -1, dtype=np.int16)
+B64_LOOKUP[np.frombuffer(B64_ALPHABET, dtype=np.uint8)] = np.arange(64)
+B64_LOOKUP[ord("=")] = 0
+
+
+def b64decode_rows(payloads):
+    """Base64-decodes equal length payloads into an (n, size) byte array.
+
+    Returns the bytes and the decoded size of each row, or None if the
+    payloads can't be decoded in one go (mixed lengths or invalid characters).
+    """
+    encoded = np.asarray(payloads, dtype="S")
+    width = encoded.dtype.itemsize
+    if width == 0 or width % 4 or (np.char.str_len(encoded) != width).any():
+        return None
+    chars = np.frombuffer(encoded.tobytes(), dtype=np.uint8).reshape(-1, width)
+    sextets = B64_LOOKUP[chars]
+    if (sextets < 0).any() or (chars[:, :-2] == ord("=")).any():
+        return None
+    s = sextets.astype(np.uint8).reshape(len(encoded), -1, 4)
+    rows = np.empty((len(encoded), width // 4, 3), dtype=np.uint8)
+    rows[..., 0] = (s[..., 0] << 2) | (s[..., 1] >> 4)
+    rows[..., 1] = (s[..., 1] << 4) | (s[..., 2] >> 2)
+    rows[..., 2] = (s[..., 2] << 6) | s[..., 3]
+    padding = (chars[:, -2:] == ord("=")).sum(1)
+    return rows.reshape(len(encoded), -1), width // 4 * 3 - padding
+
+
+def read_frames(payloads, dtype, min_size, max_size=None, name="payload"):
+    """Base64-decodes the payloads into one structured array of frames.
+
+    Frames longer than the layout are cut to its size, frames outside
+    min_size..max_size raise a ValueError naming the first bad indexes.
+    """
+    if len(payloads) and (decoded := b64decode_rows(payloads)) is not None:
+        rows, sizes = decoded
+    else:
+        # Mixed length payloads fall back to decoding one at a time
+        raw = [base64.b64decode(p) for p in payloads]
+        sizes = np.fromiter((len(r) for r in raw), dtype=np.int64, count=len(raw))
+        rows = None
+    bad = (sizes < min_size) | ((sizes > max_size) if max_size else False)
+    if bad.any():
+        indexes = np.flatnonzero(bad)
+        raise ValueError(
+            f"{name} payload(s) with invalid length at index {indexes[:10].tolist()}"
+            f"{'...' if len(indexes) > 10 else ''}"
+        )
+    if rows is None:
+        return np.frombuffer(b"".join(r[: dtype.itemsize] for r in raw), dtype=dtype)
+    return np.ascontiguousarray(rows[:, : dtype.itemsize]).view(dtype).ravel()
+
+
+def decode_lht52_bulk(payloads) -> dict:
+    """Decodes LHT52 payloads into temperature and humidity columns."""
+    frames = read_frames(payloads, LHT52_DTYPE, 4, name="LHT52")
+    return {
+        "temperature": np.round(frames["temperature"] / 100.0, 2),
+        "humidity": np.round(frames["humidity"] / 10.0, 1),
+    }
+
+
+def decode_lwl02_bulk(payloads) -> dict:
+    """Decodes LWL02 water leak payloads into columns."""
+    frames = read_frames(payloads, LWL02_DTYPE, 10, 10, name="LWL02")
+    status_bat = frames["status_bat"]
+    return {
+        "battery_voltage_v": np.round((status_bat & 0x3FFF) / 1000.0, 3),
+        "leak_detected": ((status_bat >> 14) & 0x01).astype(bool),
+        "total_leak_events": uint24(frames["total_events"]),
+        "last_leak_duration_minutes": uint24(frames["last_duration"]),
+        "alarm_active": (frames["alarm"] & 0x01).astype(bool),
+        "mode": frames["mode"],
+    }
+
+
+# Bulk counterparts of the per-message decoders in SENSOR_DECODERS
+BULK_DECODERS = {
+    decode_lht52: decode_lht52_bulk,
+    decode_lwl02: decode_lwl02_bulk,
+}
+
+
+def decode_bulk(sensor_id: str, payloads) -> dict:
+    """Decodes a list or array of base64 payloads from one sensor into columns.
+
+    The decoder is resolved through SENSOR_DECODERS, so a sensor is decoded
+    the same way as by the message decoder Lambda function.
+    """
+    decoder = SENSOR_DECODERS.get(sensor_id)
+    if not decoder:
+        raise ValueError(f"No decoder for sensor ID: '{sensor_id}'.")
+    bulk_decoder = BULK_DECODERS.get(decoder)
+    if not bulk_decoder:
+        raise ValueError(f"No bulk decoder for sensor ID: '{sensor_id}'.")
+    return bulk_decoder(payloads)
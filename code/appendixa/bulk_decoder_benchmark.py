@@ -0,0 +1,75 @@
+import base64
+import os
+import struct
+import timeit
+
+import numpy as np
+
+# The decoders don't talk to SQS, but importing the Lambda module creates its client
+os.environ.setdefault("SQS_QUEUE_URL", "")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from bulk_decoder import decode_bulk
+from message_decoder import SENSOR_DECODERS
+
+N_MESSAGES = int(os.environ.get("N_MESSAGES", "100000"))
+REPEATS = 5
+
+
+def lht52_payloads(n, rng):
+    temps = rng.integers(-2000, 4000, n)
+    humidities = rng.integers(0, 1000, n)
+    return [
+        base64.b64encode(struct.pack(">hH", t, h)).decode()
+        for t, h in zip(temps.tolist(), humidities.tolist())
+    ]
+
+
+def lwl02_payloads(n, rng):
+    return [
+        base64.b64encode(
+            struct.pack(">H B", s, 1)
+            + e.to_bytes(3, "big")
+            + d.to_bytes(3, "big")
+            + bytes([a])
+        ).decode()
+        for s, e, d, a in zip(
+            rng.integers(0, 0x7FFF, n).tolist(),
+            rng.integers(0, 2**24, n).tolist(),
+            rng.integers(0, 2**24, n).tolist(),
+            rng.integers(0, 2, n).tolist(),
+        )
+    ]
+
+
+def per_message(sensor_id, payloads):
+    decoder = SENSOR_DECODERS[sensor_id]
+    return [decoder(p) for p in payloads]
+
+
+def check(rows, columns):
+    for key, column in columns.items():
+        assert np.array_equal(np.array([r[key] for r in rows]), column), key
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(42)
+    for sensor_id, payloads in [
+        ("temp_sensor_1", lht52_payloads(N_MESSAGES, rng)),
+        ("leak_sensor_1", lwl02_payloads(N_MESSAGES, rng)),
+    ]:
+        check(per_message(sensor_id, payloads), decode_bulk(sensor_id, payloads))
+        single = min(
+            timeit.repeat(
+                lambda: per_message(sensor_id, payloads), number=1, repeat=REPEATS
+            )
+        )
+        bulk = min(
+            timeit.repeat(
+                lambda: decode_bulk(sensor_id, payloads), number=1, repeat=REPEATS
+            )
+        )
+        print(
+            f"{sensor_id}: {N_MESSAGES} messages, per-message {single * 1000:.1f} ms, "
+            f"bulk {bulk * 1000:.1f} ms ({single / bulk:.1f}x faster)"
+        )
@@ -12,44 +12,110 @@ logger.setLevel(logging.INFO)
 sqs_client = boto3.client("sqs")
 QUEUE_URL = os.environ["SQS_QUEUE_URL"]
 
+# SendMessageBatch accepts at most 10 entries per call
+SQS_BATCH_SIZE = 10
+# SQS rejects messages (body and attributes) over 256 KB, and batches whose
+# messages add up to more than that
+SQS_MAX_MESSAGE_BYTES = 262_144
+# Opt-in: pack up to this many decoded uplinks into one SQS message body
+# as {"messages": [...]}. 1 sends one SQS message per uplink.
+PACK_SIZE = int(os.environ.get("PACK_SIZE", "1"))
+if PACK_SIZE < 1:
+    raise ValueError(f"PACK_SIZE must be at least 1, got {PACK_SIZE}.")
 
-def decode_lht52(payload_data: str) -> dict:
-    """Decodes LHT52 temperature and humidity payload."""
-    raw_bytes = base64.b64decode(payload_data)
-    if len(raw_bytes) < 4:
-        raise ValueError("LHT52 payload too short.")
 
-    temp_raw, humidity_raw = struct.unpack(">hH", raw_bytes[0:4])
+# Declarative payload layouts per device profile. "format" is the struct
+# format of the payload and each field reads the value at "index", which is
+# optionally masked, shifted right by "shift" bits, divided and rounded to
+# "digits", or read as a single "bit".
+# Byte strings (e.g. "3s") are read as big-endian unsigned integers.
+# "exact" payloads must have exactly the size of the format.
+PAYLOAD_LAYOUTS = {
+    "LHT52": {
+        "format": ">hH",
+        "fields": {
+            "temperature": {"index": 0, "divisor": 100.0, "digits": 2},
+            "humidity": {"index": 1, "divisor": 10.0, "digits": 1},
+        },
+    },
+    "LWL02": {
+        "format": ">H B 3s 3s B",
+        "exact": True,
+        "fields": {
+            "battery_voltage_v": {
+                "index": 0,
+                "mask": 0x3FFF,
+                "divisor": 1000.0,
+                "digits": 3,
+            },
+            "leak_detected": {"index": 0, "bit": 14},
+            "total_leak_events": {"index": 2},
+            "last_leak_duration_minutes": {"index": 3},
+            "alarm_active": {"index": 4, "bit": 0},
+            "mode": {"index": 1},
+        },
+    },
+}
 
-    return {
-        "temperature": round(temp_raw / 100.0, 2),
-        "humidity": round(humidity_raw / 10.0, 1),
-    }
 
+def field_reader(spec: dict, is_bytes: bool):
+    """Builds the function that turns the unpacked values into one reading."""
+    index, bit = spec["index"], spec.get("bit")
+    mask, shift = spec.get("mask"), spec.get("shift", 0)
+    divisor, digits = spec.get("divisor"), spec.get("digits")
 
-def decode_lwl02(payload_data: str) -> dict:
-    """Decodes LWL02 water leak sensor payload."""
-    payload_bytes = base64.b64decode(payload_data)
-    if len(payload_bytes) < 10:
-        raise ValueError("LWL02 payload too short.")
+    def read(values: tuple):
+        value = values[index]
+        if is_bytes:
+            value = int.from_bytes(value, "big")
+        if bit is not None:
+            return bool((value >> bit) & 0x01)
+        if mask is not None:
+            value &= mask
+        value >>= shift
+        if divisor is not None:
+            value = round(value / divisor, digits)
+        return value
 
-    status_bat, mode, total_events_raw, last_duration_raw, alarm = struct.unpack(
-        ">H B 3s 3s B", payload_bytes
+    return read
+
+
+def compile_layout(profile: str, layout: dict):
+    """Pre-compiles a payload layout into a decoder function."""
+    payload_struct = struct.Struct(layout["format"])
+    size, exact = payload_struct.size, layout.get("exact", False)
+    # Which unpacked values are byte strings (e.g. the "3s" fields), from the
+    # types of the values unpacked from an empty payload
+    is_bytes = [isinstance(v, bytes) for v in payload_struct.unpack(bytes(size))]
+    readers = tuple(
+        (name, field_reader(spec, is_bytes[spec["index"]]))
+        for name, spec in layout["fields"].items()
     )
 
-    total_events = int.from_bytes(total_events_raw, "big")
-    last_duration = int.from_bytes(last_duration_raw, "big")
+    def decode(payload_data: str) -> dict:
+        raw_bytes = base64.b64decode(payload_data)
+        if len(raw_bytes) < size:
+            raise ValueError(f"{profile} payload too short.")
+        if exact and len(raw_bytes) != size:
+            raise ValueError(f"{profile} payload too long.")
+        values = payload_struct.unpack_from(raw_bytes)
+        return {name: read(values) for name, read in readers}
 
-    return {
-        "battery_voltage_v": round((status_bat & 0x3FFF) / 1000.0, 3),
-        "leak_detected": bool((status_bat >> 14) & 0x01),
-        "total_leak_events": total_events,
-        "last_leak_duration_minutes": last_duration,
-        "alarm_active": bool(alarm & 0x01),
-        "mode": mode,
-    }
+    decode.__name__ = f"decode_{profile.lower()}"
+    return decode
 
 
+# Decoders are compiled once per cold start
+PROFILE_DECODERS = {
+    profile: compile_layout(profile, layout)
+    for profile, layout in PAYLOAD_LAYOUTS.items()
+}
+
+# Decodes LHT52 temperature and humidity payload
+decode_lht52 = PROFILE_DECODERS["LHT52"]
+# Decodes LWL02 water leak sensor payload
+decode_lwl02 = PROFILE_DECODERS["LWL02"]
+
 # Map sensor IDs to their decoding functions
 SENSOR_DECODERS = {
     "temp_sensor_1": decode_lht52,
@@ -57,56 +123,241 @@ SENSOR_DECODERS = {
 }
 
 
+def device_decoders(device_profiles: dict) -> dict:
+    """Maps DevEUIs to the decoders of their profiles.
+
+    Every profile is checked at cold start, so a typo fails the deployment
+    rather than the uplinks of that device.
+    """
+    for dev_eui, profile in device_profiles.items():
+        if profile not in PAYLOAD_LAYOUTS:
+            raise ValueError(
+                f"Unknown profile '{profile}' for device {dev_eui} in "
+                f"DEVICE_PROFILES (known profiles: {', '.join(PAYLOAD_LAYOUTS)})."
+            )
+    return {
+        dev_eui.lower(): PROFILE_DECODERS[profile]
+        for dev_eui, profile in device_profiles.items()
+    }
+
+
+# Map DevEUIs to their decoding functions, from DEVICE_PROFILES
+# e.g. {"a840410b0189cfca": "LHT52"}. Devices that aren't listed are
+# resolved by the sensor ID in their topic.
+DEVICE_DECODERS = device_decoders(json.loads(os.environ.get("DEVICE_PROFILES", "{}")))
+
+
+def resolve_decoder(dev_eui: str, sensor_id: str):
+    """Finds the decoder of a device by DevEUI, or else by sensor ID."""
+    decoder = DEVICE_DECODERS.get(dev_eui.lower()) or SENSOR_DECODERS.get(sensor_id)
+    if not decoder:
+        raise ValueError(f"No decoder for sensor ID: '{sensor_id}'.")
+    return decoder
+
+
+def decode_event(event: dict, request_id: str) -> dict:
+    """Validates and decodes one IoT Core uplink event into an enriched message."""
+    lorawan_meta = event.get("WirelessMetadata", {}).get("LoRaWAN", {})
+    topic = event.get("topic")
+    dev_eui = lorawan_meta.get("DevEui")
+    payload = event.get("PayloadData")
+
+    if not all([topic, dev_eui, payload]):
+        raise ValueError("Missing required event data.")
+
+    topic_parts = topic.split("/")
+    if len(topic_parts) < 4:
+        raise ValueError("Invalid topic format.")
+    location, measurement_type, place, sensor_id = topic_parts[:4]
+
+    decoder = resolve_decoder(dev_eui, sensor_id)
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "location": location,
+        "measurement_type": measurement_type,
+        "place": place,
+        "sensor_id": sensor_id,
+        "dev_eui": dev_eui,
+        "readings": decoder(payload),
+        "request_id": request_id,
+    }
+
+
+# SQS message attributes consumers can filter on, and the fields they're from
+ATTRIBUTE_FIELDS = {
+    "sensor_type": "measurement_type",
+    "location": "location",
+    "sensor_id": "sensor_id",
+    "dev_eui": "dev_eui",
+}
+
+
+def message_attributes(messages: list) -> dict:
+    """SQS message attributes of an entry carrying the messages.
+
+    A packed entry only gets the attributes that have the same value in all
+    of its messages (e.g. the location, if they're all from one place).
+    """
+    attributes = {}
+    for attribute, field in ATTRIBUTE_FIELDS.items():
+        values = {m[field] for m in messages}
+        if len(values) == 1:
+            attributes[attribute] = {"StringValue": values.pop(), "DataType": "String"}
+    return attributes
+
+
+def message_size(body: str, attributes: dict) -> int:
+    """Size of an SQS message as it counts toward SQS_MAX_MESSAGE_BYTES."""
+    return len(body.encode()) + sum(
+        len(name.encode())
+        + len(attribute["DataType"].encode())
+        + len(attribute["StringValue"].encode())
+        for name, attribute in attributes.items()
+    )
+
+
+def make_entry(chunk: list, packed: bool) -> dict:
+    """Builds an SQS batch entry from (index, JSON body, message) tuples."""
+    indexes, bodies, chunk_messages = zip(*chunk)
+    attributes = message_attributes(chunk_messages)
+    if packed:
+        # The same as json.dumps({"messages": chunk_messages})
+        body = '{"messages": [' + ", ".join(bodies) + "]}"
+        attributes["packed"] = {
+            "StringValue": str(len(chunk)),
+            "DataType": "Number",
+        }
+    else:
+        body = bodies[0]
+    return {
+        "indexes": list(indexes),
+        "MessageBody": body,
+        "MessageAttributes": attributes,
+        "size": message_size(body, attributes),
+    }
+
+
+def build_entries(messages: list, pack_size: int = PACK_SIZE) -> list:
+    """Builds SQS batch entries, each with the indexes of the events it carries.
+
+    A packed entry is closed early when one more message would take it over
+    SQS_MAX_MESSAGE_BYTES.
+    """
+    entries, chunk = [], []
+    for i, message in messages:
+        candidate = chunk + [(i, json.dumps(message), message)]
+        if len(candidate) > pack_size or (
+            chunk and make_entry(candidate, True)["size"] > SQS_MAX_MESSAGE_BYTES
+        ):
+            entries.append(make_entry(chunk, pack_size > 1))
+            candidate = candidate[-1:]
+        chunk = candidate
+    if chunk:
+        entries.append(make_entry(chunk, pack_size > 1))
+    return entries
+
+
+def sqs_batches(entries: list):
+    """Groups entries into SendMessageBatch calls, within the SQS limits."""
+    batch, batch_bytes = [], 0
+    for entry in entries:
+        if batch and (
+            len(batch) == SQS_BATCH_SIZE
+            or batch_bytes + entry["size"] > SQS_MAX_MESSAGE_BYTES
+        ):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(entry)
+        batch_bytes += entry["size"]
+    if batch:
+        yield batch
+
+
+def send_entries(entries: list) -> dict:
+    """Sends entries with SendMessageBatch. Returns {event index: error}.
+
+    Entries over SQS_MAX_MESSAGE_BYTES aren't sent and are reported as failed.
+    """
+    failures = {}
+    for entry in entries:
+        if entry["size"] > SQS_MAX_MESSAGE_BYTES:
+            error = f"Message of {entry['size']} bytes is over the SQS limit."
+            failures.update({i: error for i in entry["indexes"]})
+    entries = [e for e in entries if e["size"] <= SQS_MAX_MESSAGE_BYTES]
+    for chunk in sqs_batches(entries):
+        try:
+            response = sqs_client.send_message_batch(
+                QueueUrl=QUEUE_URL,
+                Entries=[
+                    {
+                        "Id": str(n),
+                        "MessageBody": e["MessageBody"],
+                        "MessageAttributes": e["MessageAttributes"],
+                    }
+                    for n, e in enumerate(chunk)
+                ],
+            )
+            failed = [(chunk[int(f["Id"])], f["Message"]) for f in response["Failed"]]
+        except ClientError as e:
+            logger.error(f"AWS service error: {e}")
+            failed = [(entry, "AWS service error.") for entry in chunk]
+        for entry, error in failed:
+            failures.update({i: error for i in entry["indexes"]})
+    return failures
+
+
+def process_batch(events: list, context: object) -> dict:
+    """Decodes a list of uplink events in one pass and sends them in batches."""
+    failures, messages = {}, []
+    for i, event in enumerate(events):
+        try:
+            messages.append((i, decode_event(event, context.aws_request_id)))
+        except Exception as e:
+            logger.error(f"Failed to decode event {i}: {e}")
+            failures[i] = str(e)
+
+    failures.update(send_entries(build_entries(messages)))
+    logger.info(
+        f"Batch complete. Sent: {len(events) - len(failures)}, Failed: {len(failures)}"
+    )
+    return {
+        "statusCode": 207 if failures else 200,
+        "body": json.dumps(
+            {
+                "processed": len(events) - len(failures),
+                "failures": [
+                    {"index": i, "error": error}
+                    for i, error in sorted(failures.items())
+                ],
+            }
+        ),
+    }
+
+
 # --- Main Lambda Handler ---
 def lambda_handler(event: dict, context: object) -> dict:
     """Processes and routes LoRaWAN sensor data."""
+    # A list of uplink events (e.g. a gateway burst or a replay) is sent in batches
+    if isinstance(event, list):
+        return process_batch(event, context)
+
     try:
-        # Validate and extract core data from event
-        lorawan_meta = event.get("WirelessMetadata", {}).get("LoRaWAN", {})
-        topic = event.get("topic")
-        dev_eui = lorawan_meta.get("DevEui")
-        payload = event.get("PayloadData")
-
-        if not all([topic, dev_eui, payload]):
-            raise ValueError("Missing required event data.")
-
-        # Parse topic for metadata
-        topic_parts = topic.split("/")
-        if len(topic_parts) < 4:
-            raise ValueError("Invalid topic format.")
-        location, measurement_type, place, sensor_id = topic_parts[:4]
-
-        logger.info(f"Processing sensor {sensor_id} from {place} ({dev_eui})")
-
-        # Decode payload using the appropriate decoder
-        decoder = SENSOR_DECODERS.get(sensor_id)
-        if not decoder:
-            raise ValueError(f"No decoder for sensor ID: '{sensor_id}'.")
-
-        decoded_readings = decoder(payload)
-
-        # Enrich the data and prepare for SQS
-        enriched_data = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "location": location,
-            "measurement_type": measurement_type,
-            "place": place,
-            "sensor_id": sensor_id,
-            "dev_eui": dev_eui,
-            "readings": decoded_readings,
-            "request_id": context.aws_request_id,
-        }
+        message = decode_event(event, context.aws_request_id)
+        dev_eui = message["dev_eui"]
+        logger.info(
+            f"Processing sensor {message['sensor_id']} from {message['place']} "
+            f"({dev_eui})"
+        )
 
         # Route to SQS
+        (entry,) = build_entries([(0, message)], pack_size=1)
+        if entry["size"] > SQS_MAX_MESSAGE_BYTES:
+            raise ValueError(f"Message of {entry['size']} bytes is over the SQS limit.")
         sqs_client.send_message(
             QueueUrl=QUEUE_URL,
-            MessageBody=json.dumps(enriched_data),
-            MessageAttributes={
-                "sensor_type": {"StringValue": measurement_type, "DataType": "String"},
-                "location": {"StringValue": location, "DataType": "String"},
-                "sensor_id": {"StringValue": sensor_id, "DataType": "String"},
-                "dev_eui": {"StringValue": dev_eui, "DataType": "String"},
-            },
+            MessageBody=entry["MessageBody"],
+            MessageAttributes=entry["MessageAttributes"],
         )
 
         logger.info(f"Successfully sent data to SQS for device {dev_eui}.")
@@ -1,5 +1,7 @@
 import base64, struct
 
+import numpy as np
+
 
 def decode_sensor_message(base64_payload):
     raw_bytes = base64.b64decode(base64_payload)
@@ -13,8 +15,25 @@ def decode_sensor_message(base64_payload):
     return {"temperature": temperature, "humidity": humidity, "unit": "celsius"}
 
 
+def decode_sensor_messages(base64_payloads):
+    # Decodes many messages at once: the first 4 bytes of every payload are
+    # read as a big-endian int16 and uint16 with a NumPy structured dtype
+    raw = b"".join(base64.b64decode(p)[0:4] for p in base64_payloads)
+    readings = np.frombuffer(raw, dtype=[("temp", ">i2"), ("humidity", ">u2")])
+
+    return {
+        "temperature": readings["temp"] / 100.0,
+        "humidity": readings["humidity"] / 10.0,
+        "unit": "celsius",
+    }
+
+
 payload = "B1QDOH//AWhRYAQ="
 data = decode_sensor_message(payload)
 print(f"Raw data: B1QDOH//AWhRYAQ=")
 print(f"Temperature: {data['temperature']}°C")
 print(f"Humidity: {data['humidity']}%")
+
+batch = decode_sensor_messages([payload] * 3)
+print(f"Temperatures: {batch['temperature']}°C")
+print(f"Humidities: {batch['humidity']}%")
@@ -0,0 +1,81 @@
+import json
+import os
+import random
+import timeit
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+# Conversion doesn't talk to DynamoDB, but importing the Lambda module creates its table
+os.environ.setdefault("DYNAMODB_TABLE_NAME", "benchmark")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from data_persistor import convert_for_dynamodb, prepare_items
+
+N_RECORDS = int(os.environ.get("N_RECORDS", "10000"))
+REPEATS = 7
+
+
+def convert_per_message(data: dict) -> dict:
+    # The original conversion: strptime, processed_at and Decimal(str()) per message
+    dt_obj = datetime.strptime(data["timestamp"], "%Y-%m-%dT%H:%M:%S.%f%z")
+    epoch_time = int(dt_obj.timestamp())
+    item = {
+        "partKey": data["dev_eui"],
+        "sortKey": epoch_time,
+        "timestamp_iso": data["timestamp"],
+        "processed_at": datetime.now(timezone.utc).isoformat(),
+        "ttl": epoch_time + (30 * 24 * 60 * 60),
+    }
+    for key, value in data["readings"].items():
+        if isinstance(value, float):
+            item[key] = Decimal(str(value))
+        else:
+            item[key] = value
+    return item
+
+
+def make_messages(n):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "timestamp": (
+                start + timedelta(seconds=30 * i, microseconds=1)
+            ).isoformat(),
+            "dev_eui": f"a840410b0189cf{i % 16:02x}",
+            "readings": {
+                "temperature": round(random.uniform(15, 25), 2),
+                "humidity": round(random.uniform(30, 70), 1),
+            },
+        }
+        for i in range(n)
+    ]
+
+
+def per_record_us(fn):
+    return min(timeit.repeat(fn, number=1, repeat=REPEATS)) / N_RECORDS * 1e6
+
+
+if __name__ == "__main__":
+    random.seed(42)
+    messages = make_messages(N_RECORDS)
+    records = [
+        {"messageId": str(i), "body": json.dumps(m)} for i, m in enumerate(messages)
+    ]
+    processed_at = datetime.now(timezone.utc).isoformat()
+    for message in messages:
+        expected = convert_per_message(message)
+        converted = convert_for_dynamodb(message, processed_at)
+        expected.pop("processed_at"), converted.pop("processed_at")
+        assert expected == converted
+
+    old = per_record_us(lambda: [convert_per_message(m) for m in messages])
+    new = per_record_us(
+        lambda: [convert_for_dynamodb(m, processed_at) for m in messages]
+    )
+    batch = per_record_us(lambda: prepare_items(records, []))
+    print(f"{N_RECORDS} records per invocation")
+    print(f"per-message conversion: {old:.2f} us/record")
+    print(f"batch conversion:       {new:.2f} us/record ({old / new:.1f}x faster)")
+    print(
+        f"prepare_items (JSON parsing, conversion, deduplication): {batch:.2f} us/record"
+    )
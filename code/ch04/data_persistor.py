@@ -1,7 +1,10 @@
 import json
 import os
+import random
+import time
 from datetime import datetime, timezone
-from decimal import Decimal
+from decimal import Context, Decimal
+from functools import lru_cache
 import logging
 import boto3
 from botocore.exceptions import ClientError
@@ -10,52 +13,83 @@ from botocore.exceptions import ClientError
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-dynamodb = boto3.resource("dynamodb")
+# Initialize AWS clients (set DYNAMODB_ENDPOINT_URL to use DynamoDB Local)
+dynamodb = boto3.resource(
+    "dynamodb", endpoint_url=os.environ.get("DYNAMODB_ENDPOINT_URL")
+)
 table = dynamodb.Table(os.environ["DYNAMODB_TABLE_NAME"])
 
+# "single" writes each message with its own conditional PutItem. "batch" writes
+# up to 25 items per BatchWriteItem call and "transact" up to 100 items per
+# TransactWriteItems call, which keeps the duplicate check of "single".
+# BatchWriteItem has no condition expressions, so in "batch" mode a message
+# that was already stored (e.g. redelivered by SQS) overwrites its item.
+PERSIST_MODE = os.environ.get("PERSIST_MODE", "single")
+MAX_WRITE_RETRIES = int(os.environ.get("MAX_WRITE_RETRIES", "5"))
+BATCH_WRITE_SIZE = 25
+TRANSACT_WRITE_SIZE = 100
+TTL_SECONDS = 30 * 24 * 60 * 60
+# DynamoDB numbers have up to 38 digits of precision
+DECIMAL_CONTEXT = Context(prec=38)
 
-def process_message_body(body: str) -> dict:
-    """Parses and validates the JSON message body."""
+
+def process_message_body(body: str) -> list:
+    """Parses and validates the JSON message body.
+
+    The message decoder can pack several decoded messages into one body as
+    {"messages": [...]}, so this always returns a list of messages.
+    """
     try:
         message = json.loads(body)
     except json.JSONDecodeError as e:
         raise ValueError(f"Invalid JSON: {e}")
 
+    messages = message["messages"] if "messages" in message else [message]
     required_fields = ["dev_eui", "timestamp", "readings"]
-    if not all(field in message for field in required_fields):
-        raise ValueError(f"Missing required field(s): {', '.join(required_fields)}")
-    if not isinstance(message.get("readings"), dict):
-        raise ValueError("'readings' must be a dictionary")
+    for message in messages:
+        if not all(field in message for field in required_fields):
+            raise ValueError(f"Missing required field(s): {', '.join(required_fields)}")
+        if not isinstance(message.get("readings"), dict):
+            raise ValueError("'readings' must be a dictionary")
+
+    return messages
+
 
-    return message
+@lru_cache(maxsize=65536)
+def to_decimal(value: float) -> Decimal:
+    """Converts a float to a Decimal with the same digits as its str().
 
+    Sensor readings repeat a lot (e.g. 21.55 degrees), so conversions are cached.
+    """
+    return DECIMAL_CONTEXT.create_decimal(repr(value))
 
-def convert_for_dynamodb(data: dict) -> dict:
+
+def convert_for_dynamodb(data: dict, processed_at: str = None) -> dict:
     """Converts a dictionary's floats and timestamp for DynamoDB storage,
     breaking down readings into individual attributes."""
     # Convert timestamp to epoch
     try:
-        dt_obj = datetime.strptime(data["timestamp"], "%Y-%m-%dT%H:%M:%S.%f%z")
-        epoch_time = int(dt_obj.timestamp())
-    except ValueError as e:
+        dt_obj = datetime.fromisoformat(data["timestamp"])
+    except (TypeError, ValueError) as e:
         raise ValueError(f"Invalid timestamp format: {e}")
+    if dt_obj.tzinfo is None:
+        raise ValueError("Invalid timestamp format: missing UTC offset")
+    epoch_time = int(dt_obj.timestamp())
 
     # Build the final DynamoDB item with core attributes
     item = {
         "partKey": data["dev_eui"],
         "sortKey": epoch_time,
         "timestamp_iso": data["timestamp"],
-        "processed_at": datetime.now(timezone.utc).isoformat(),
-        "ttl": epoch_time + (30 * 24 * 60 * 60),
+        "processed_at": processed_at or datetime.now(timezone.utc).isoformat(),
+        "ttl": epoch_time + TTL_SECONDS,
     }
 
     # Break down readings and add them as individual attributes
-    for key, value in data["readings"].items():
-        if isinstance(value, float):
-            item[key] = Decimal(str(value))
-        else:
-            item[key] = value
+    item.update(
+        (key, to_decimal(value) if isinstance(value, float) else value)
+        for key, value in data["readings"].items()
+    )
 
     return item
 
@@ -79,19 +113,146 @@ def save_item_to_dynamodb(item: dict, message_id: str):
             raise
 
 
-def lambda_handler(event, context):
-    """AWS Lambda handler to process a batch of SQS messages."""
-    failures = []
+def backoff(attempt: int, base: float = 0.05, cap: float = 2.0):
+    """Sleeps with exponential backoff and full jitter before a retry."""
+    time.sleep(random.uniform(0, min(cap, base * 2**attempt)))
+
 
-    for record in event.get("Records", []):
+def prepare_items(records: list, failures: list) -> list:
+    """Converts SQS records to DynamoDB items, dropping duplicates in the batch.
+
+    Duplicates are records with a message ID or a partKey/sortKey already seen
+    in this batch. BatchWriteItem rejects a request that contains the same key
+    twice, and the conditional write in "single" mode would skip them anyway.
+    """
+    items, seen_message_ids, seen_keys = [], set(), set()
+    processed_at = datetime.now(timezone.utc).isoformat()
+    for record in records:
         message_id = record.get("messageId")
+        if message_id in seen_message_ids:
+            logger.warning(f"Duplicate message {message_id} in batch. Skipping.")
+            continue
+        seen_message_ids.add(message_id)
         try:
-            message_body = process_message_body(record.get("body"))
-            dynamodb_item = convert_for_dynamodb(message_body)
-            save_item_to_dynamodb(dynamodb_item, message_id)
+            record_items = [
+                convert_for_dynamodb(message, processed_at)
+                for message in process_message_body(record.get("body"))
+            ]
         except Exception:
             logger.error(f"Failed to process message {message_id}.", exc_info=True)
             failures.append({"itemIdentifier": message_id})
+            continue
+        for item in record_items:
+            key = (item["partKey"], item["sortKey"])
+            if key in seen_keys:
+                logger.warning(f"Duplicate message {message_id} detected. Skipping.")
+                continue
+            seen_keys.add(key)
+            item["message_id"] = message_id
+            items.append(item)
+    return items
+
+
+def batch_write_items(items: list) -> list:
+    """Writes items with BatchWriteItem, retrying UnprocessedItems with backoff.
+
+    Unlike save_item_to_dynamodb, items that already exist are overwritten,
+    because BatchWriteItem doesn't support a ConditionExpression.
+
+    Returns the message IDs of the items that could not be written.
+    """
+    failed = []
+    for i in range(0, len(items), BATCH_WRITE_SIZE):
+        chunk = items[i : i + BATCH_WRITE_SIZE]
+        pending = [{"PutRequest": {"Item": item}} for item in chunk]
+        try:
+            for attempt in range(MAX_WRITE_RETRIES + 1):
+                response = dynamodb.batch_write_item(RequestItems={table.name: pending})
+                pending = response.get("UnprocessedItems", {}).get(table.name, [])
+                if not pending or attempt == MAX_WRITE_RETRIES:
+                    break
+                backoff(attempt)
+        except ClientError:
+            logger.error("BatchWriteItem failed.", exc_info=True)
+            pending = [{"PutRequest": {"Item": item}} for item in chunk]
+        failed.extend(r["PutRequest"]["Item"]["message_id"] for r in pending)
+    return failed
+
+
+def transact_write_items(items: list) -> list:
+    """Writes items with conditional TransactWriteItems calls.
+
+    The client of the boto3 resource serializes the items, so they are passed
+    as plain dicts. A transaction is all or nothing, so when it is cancelled because some
+    items already exist, those duplicates are dropped and the rest retried.
+    Returns the message IDs of the items that could not be written.
+    """
+    failed = []
+    for i in range(0, len(items), TRANSACT_WRITE_SIZE):
+        pending = items[i : i + TRANSACT_WRITE_SIZE]
+        for attempt in range(MAX_WRITE_RETRIES + 1):
+            try:
+                dynamodb.meta.client.transact_write_items(
+                    TransactItems=[
+                        {
+                            "Put": {
+                                "TableName": table.name,
+                                "Item": item,
+                                "ConditionExpression": "attribute_not_exists(message_id)",
+                            }
+                        }
+                        for item in pending
+                    ]
+                )
+                pending = []
+                break
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "TransactionCanceledException":
+                    logger.error("TransactWriteItems failed.", exc_info=True)
+                    break
+                reasons = e.response.get("CancellationReasons", [])
+                duplicates = {
+                    j
+                    for j, reason in enumerate(reasons)
+                    if reason.get("Code") == "ConditionalCheckFailed"
+                }
+                for j in duplicates:
+                    logger.warning(
+                        f"Duplicate message {pending[j]['message_id']} detected. Skipping."
+                    )
+                pending = [p for j, p in enumerate(pending) if j not in duplicates]
+                if not pending:
+                    break
+                if not duplicates and attempt < MAX_WRITE_RETRIES:
+                    # Cancelled by a conflict or throttling rather than duplicates
+                    backoff(attempt)
+        failed.extend(item["message_id"] for item in pending)
+    return failed
+
+
+def lambda_handler(event, context):
+    """AWS Lambda handler to process a batch of SQS messages."""
+    failures = []
+
+    if PERSIST_MODE in ["batch", "transact"]:
+        items = prepare_items(event.get("Records", []), failures)
+        write_items = (
+            batch_write_items if PERSIST_MODE == "batch" else transact_write_items
+        )
+        # A packed message is retried as a whole if any of its items failed
+        failed = dict.fromkeys(write_items(items))
+        failures.extend({"itemIdentifier": m} for m in failed)
+    else:
+        processed_at = datetime.now(timezone.utc).isoformat()
+        for record in event.get("Records", []):
+            message_id = record.get("messageId")
+            try:
+                for message_body in process_message_body(record.get("body")):
+                    dynamodb_item = convert_for_dynamodb(message_body, processed_at)
+                    save_item_to_dynamodb(dynamodb_item, message_id)
+            except Exception:
+                logger.error(f"Failed to process message {message_id}.", exc_info=True)
+                failures.append({"itemIdentifier": message_id})
 
     success_count = len(event.get("Records", [])) - len(failures)
 
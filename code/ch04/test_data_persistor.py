@@ -0,0 +1,142 @@
+"""
+End to end tests of the "transact" and "batch" modes of data_persistor.py
+against a mocked DynamoDB (moto). Run them with:
+python -m pytest test_data_persistor.py
+"""
+
+import importlib
+import json
+
+import boto3
+import pytest
+from moto import mock_aws
+
+TABLE_NAME = "sensor-data-test"
+
+
+def load_persistor(monkeypatch, mode):
+    monkeypatch.setenv("DYNAMODB_TABLE_NAME", TABLE_NAME)
+    monkeypatch.setenv("PERSIST_MODE", mode)
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.delenv("DYNAMODB_ENDPOINT_URL", raising=False)
+    boto3.client("dynamodb").create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[
+            {"AttributeName": "partKey", "KeyType": "HASH"},
+            {"AttributeName": "sortKey", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "partKey", "AttributeType": "S"},
+            {"AttributeName": "sortKey", "AttributeType": "N"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    import data_persistor
+
+    persistor = importlib.reload(data_persistor)
+    # Retries don't need to wait against the mock
+    monkeypatch.setattr(persistor, "backoff", lambda attempt: None)
+    return persistor
+
+
+@pytest.fixture
+def persistor(monkeypatch):
+    with mock_aws():
+        yield load_persistor(monkeypatch, "transact")
+
+
+@pytest.fixture
+def batch_persistor(monkeypatch):
+    with mock_aws():
+        yield load_persistor(monkeypatch, "batch")
+
+
+def leave_unprocessed(persistor, monkeypatch, unprocessed):
+    """Makes BatchWriteItem return the items unprocessed(item, call) selects
+    as UnprocessedItems, like DynamoDB does when it throttles, and write the
+    rest. Returns the number of items sent in each call."""
+    write = persistor.dynamodb.batch_write_item
+    calls = []
+
+    def batch_write_item(RequestItems):
+        requests = RequestItems[TABLE_NAME]
+        held = [r for r in requests if unprocessed(r["PutRequest"]["Item"], len(calls))]
+        calls.append(len(requests))
+        written = [r for r in requests if r not in held]
+        if written:
+            write(RequestItems={TABLE_NAME: written})
+        return {"UnprocessedItems": {TABLE_NAME: held} if held else {}}
+
+    monkeypatch.setattr(persistor.dynamodb, "batch_write_item", batch_write_item)
+    return calls
+
+
+def sqs_record(message_id, dev_eui, second):
+    body = {
+        "dev_eui": dev_eui,
+        "timestamp": f"2025-01-01T00:00:{second:02d}+00:00",
+        "readings": {"temperature": 21.55, "humidity": 40},
+    }
+    return {"messageId": message_id, "body": json.dumps(body)}
+
+
+def test_transact_mode_writes_every_message(persistor):
+    records = [sqs_record(f"m{i}", f"dev{i % 3}", i) for i in range(42)]
+
+    response = persistor.lambda_handler({"Records": records}, None)
+
+    assert response == {"batchItemFailures": []}
+    items = persistor.table.scan()["Items"]
+    assert len(items) == 42
+    assert {item["message_id"] for item in items} == {f"m{i}" for i in range(42)}
+
+
+def test_transact_mode_skips_stored_and_repeated_messages(persistor):
+    records = [sqs_record(f"m{i}", "dev0", i) for i in range(5)]
+    persistor.lambda_handler({"Records": records[:2]}, None)
+
+    # m1 was already stored, m3 is delivered twice in this batch
+    response = persistor.lambda_handler({"Records": records[1:] + [records[3]]}, None)
+
+    assert response == {"batchItemFailures": []}
+    items = persistor.table.scan()["Items"]
+    assert sorted(item["message_id"] for item in items) == [f"m{i}" for i in range(5)]
+
+
+def test_batch_mode_retries_unprocessed_items(batch_persistor, monkeypatch):
+    records = [sqs_record(f"m{i}", f"dev{i % 3}", i) for i in range(42)]
+    # The first call of each chunk leaves every other item unprocessed
+    calls = leave_unprocessed(
+        batch_persistor,
+        monkeypatch,
+        lambda item, call: call % 2 == 0 and item["sortKey"] % 2 == 0,
+    )
+
+    response = batch_persistor.lambda_handler({"Records": records}, None)
+
+    assert response == {"batchItemFailures": []}
+    # Two chunks (25 and 17 items), each retried once with its unprocessed items
+    assert calls == [25, 13, 17, 8]
+    items = batch_persistor.table.scan()["Items"]
+    assert {item["message_id"] for item in items} == {f"m{i}" for i in range(42)}
+
+
+def test_batch_mode_reports_items_that_stay_unprocessed(batch_persistor, monkeypatch):
+    monkeypatch.setattr(batch_persistor, "MAX_WRITE_RETRIES", 2)
+    records = [sqs_record(f"m{i}", "dev0", i) for i in range(5)]
+    records.append({"messageId": "bad", "body": "not json"})
+    calls = leave_unprocessed(
+        batch_persistor, monkeypatch, lambda item, call: item["message_id"] == "m3"
+    )
+
+    response = batch_persistor.lambda_handler({"Records": records}, None)
+
+    assert response == {
+        "batchItemFailures": [{"itemIdentifier": "bad"}, {"itemIdentifier": "m3"}]
+    }
+    # The first attempt and MAX_WRITE_RETRIES retries
+    assert calls == [5, 1, 1]
+    items = batch_persistor.table.scan()["Items"]
+    assert sorted(item["message_id"] for item in items) == ["m0", "m1", "m2", "m4"]
@@ -1,24 +1,53 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import graphene
-from graphene import ObjectType, String, List, Float
+from graphene import ObjectType, String, List, Float, Boolean
 from neo4j import GraphDatabase, basic_auth, exceptions as neo4j_exceptions
 import boto3
 from datetime import datetime
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import json
 import os
+import time
 from typing import Dict, Any
 
+# Sensors are queried concurrently through one shared client; the pool size
+# bounds how many queries are in flight. Each sensor stops paging once its
+# query has run for DYNAMO_QUERY_TIMEOUT seconds and returns the rows read so
+# far with a cursor, so it holds a pool thread for at most about twice that
+# (the deadline plus the page request in flight, retries included).
+DYNAMO_MAX_CONCURRENCY = int(os.environ.get("DYNAMO_MAX_CONCURRENCY", "16"))
+DYNAMO_QUERY_TIMEOUT = float(os.environ.get("DYNAMO_QUERY_TIMEOUT", "5"))
+# Attempts per page request (the first one plus retries), which share the timeout
+DYNAMO_MAX_ATTEMPTS = int(os.environ.get("DYNAMO_MAX_ATTEMPTS", "2"))
+# Each query page is at most 1 MB, so this caps the data read per sensor per
+# request. Sensors with more data return a cursor to fetch the next pages.
+DYNAMO_PAGE_BUDGET = int(os.environ.get("DYNAMO_PAGE_BUDGET", "10"))
+# Set to e.g. http://localhost:8000 to run against DynamoDB Local
+DYNAMO_ENDPOINT_URL = os.environ.get("DYNAMO_ENDPOINT_URL")
+
 try:
     dynamodb = boto3.client(
         "dynamodb",
         region_name="us-east-1",
+        endpoint_url=DYNAMO_ENDPOINT_URL,
+        config=Config(
+            max_pool_connections=DYNAMO_MAX_CONCURRENCY,
+            connect_timeout=DYNAMO_QUERY_TIMEOUT / DYNAMO_MAX_ATTEMPTS,
+            read_timeout=DYNAMO_QUERY_TIMEOUT / DYNAMO_MAX_ATTEMPTS,
+            retries={"total_max_attempts": DYNAMO_MAX_ATTEMPTS, "mode": "standard"},
+        ),
     )
     print("Successfully connected to DynamoDB.")
 except ClientError as e:
     print(f"Error connecting to DynamoDB: {e}")
     dynamodb = None
 
+dynamo_pool = ThreadPoolExecutor(max_workers=DYNAMO_MAX_CONCURRENCY)
+
 MEMGRAPH_HOST = os.environ.get("MEMGRAPH_HOST")
 MEMGRAPH_PORT = os.environ.get("MEMGRAPH_PORT")
 MEMGRAPH_USER = os.environ.get("MEMGRAPH_USER")
@@ -60,6 +89,8 @@ class MeasurementGroup(ObjectType):
     name = String(required=True)
     unit = String()
     values = List(Measurement, required=True)
+    has_more = Boolean(required=True)
+    cursor = String()
 
 
 class Sensor(ObjectType):
@@ -101,9 +132,12 @@ class Query(ObjectType):
             required=True,
             description="The end date for the data query (ISO 8601 format).",
         ),
+        cursor=String(
+            description="The cursor returned by a measurement group with more data."
+        ),
     )
 
-    def resolve_spaces(self, info, space, start_date, end_date):
+    def resolve_spaces(self, info, space, start_date, end_date, cursor=None):
         if not driver or not dynamodb:
             print("Database connection not available.")
             return []
@@ -183,10 +217,21 @@ class Query(ObjectType):
         start_ts = iso_to_timestamp(start_date)
         end_ts = iso_to_timestamp(end_date)
 
+        # A cursor resumes only the sensors that had more data, from where
+        # they left off
+        start_keys = decode_cursor(cursor) if cursor else {}
+        if cursor:
+            query_sensors = [s for s in memgraph_sensors if s["sensorId"] in start_keys]
+        else:
+            query_sensors = memgraph_sensors
+
         # Get all sensor measurements from DynamoDB
-        all_measurements = get_sensor_measurements_from_dynamo(
-            memgraph_sensors, start_ts, end_ts
+        all_measurements, errors, last_keys = get_sensor_measurements_from_dynamo(
+            query_sensors, start_ts, end_ts, start_keys
         )
+        # Sensors that failed or timed out don't fail the whole query, they are
+        # reported in the "errors" field of the response instead
+        info.context.setdefault("errors", []).extend(errors)
 
         # Group data by space, sensors, documents, images and measurement type (Unchanged logic)
         spaces_data: Dict[str, Dict[str, Any]] = {}
@@ -288,9 +333,15 @@ class Query(ObjectType):
                     for val in values
                 ]
                 unit = get_unit_for_measurement_type(measurement_type)
+                # Sensors that ran out of page budget can be resumed with the cursor
+                pending = pending_keys(values, last_keys)
                 measurement_groups.append(
                     MeasurementGroup(
-                        name=measurement_type, unit=unit, values=measurements
+                        name=measurement_type,
+                        unit=unit,
+                        values=measurements,
+                        has_more=bool(pending),
+                        cursor=encode_cursor(pending) if pending else None,
                     )
                 )
 
@@ -307,48 +358,125 @@ class Query(ObjectType):
         return results
 
 
-def get_sensor_measurements_from_dynamo(sensors, start_timestamp, end_timestamp):
+# Follows LastEvaluatedKey so windows with more than 1 MB of data aren't truncated
+def paginate_sensor_query(
+    sensor_id, start_timestamp, end_timestamp, start_key=None, deadline=None
+):
+    # DynamoDB requires string values for ExpressionAttributeValues
+    params = {
+        "TableName": "sensor-data",
+        "KeyConditionExpression": "#pk = :sensor_id AND #sk BETWEEN :start AND :end",
+        "ExpressionAttributeNames": {"#pk": "partKey", "#sk": "sortKey"},
+        "ExpressionAttributeValues": {
+            ":sensor_id": {"S": sensor_id},
+            # Timestamps are stored as Numbers in DynamoDB
+            ":start": {"N": str(start_timestamp)},
+            ":end": {"N": str(end_timestamp)},
+        },
+    }
+    for _ in range(DYNAMO_PAGE_BUDGET):
+        if start_key:
+            params["ExclusiveStartKey"] = start_key
+        page = dynamodb.query(**params)
+        yield page
+        start_key = page.get("LastEvaluatedKey")
+        if not start_key:
+            return
+        if deadline is not None and time.monotonic() >= deadline:
+            # Out of time, the LastEvaluatedKey of this page is the cursor
+            return
+
+
+def decode_measurements(sensor, items):
+    for item in items:
+        # Ensure sortKey is handled correctly, it's a string from DynamoDB
+        timestamp_str = item["sortKey"]["N"]
+        measurement = {
+            "spaceName": sensor["spaceName"],
+            "sensor_id": item["partKey"]["S"],
+            "timestamp": timestamp_str,
+        }
+        for key, value in item.items():
+            if key not in ["partKey", "sortKey"] and "N" in value:
+                # Convert DynamoDB Number string to Python float
+                measurement[key] = float(value["N"])
+        yield measurement
+
+
+def query_sensor(sensor, start_timestamp, end_timestamp, start_key=None):
+    # The query stops paging at this time, see DYNAMO_QUERY_TIMEOUT
+    deadline = time.monotonic() + DYNAMO_QUERY_TIMEOUT
+    measurements = []
+    last_key = None
+    pages = paginate_sensor_query(
+        sensor["sensorId"], start_timestamp, end_timestamp, start_key, deadline
+    )
+    for page in pages:
+        measurements.extend(decode_measurements(sensor, page.get("Items", [])))
+        last_key = page.get("LastEvaluatedKey")
+    # last_key is only set if the page budget or the deadline ran out before
+    # the end of the window
+    return measurements, last_key
+
+
+def get_sensor_measurements_from_dynamo(
+    sensors, start_timestamp, end_timestamp, start_keys=None
+):
     all_measurements = []
+    errors = []
+    # Resume keys of the sensors that ran out of page budget
+    last_keys = {}
     if not dynamodb:
-        return all_measurements
-
-    for sensor in sensors:
+        return all_measurements, errors, last_keys
+    start_keys = start_keys or {}
+
+    # Submit one query per sensor to the shared pool so they run concurrently
+    futures = {
+        dynamo_pool.submit(
+            query_sensor,
+            sensor,
+            start_timestamp,
+            end_timestamp,
+            start_keys.get(sensor["sensorId"]),
+        ): sensor
+        for sensor in sensors
+    }
+    # Every query stops at its own deadline (see query_sensor), so waiting for
+    # the results is bounded too
+    for future, sensor in futures.items():
         try:
-            # DynamoDB requires string values for ExpressionAttributeValues
-            response = dynamodb.query(
-                TableName="sensor-data",
-                KeyConditionExpression="#pk = :sensor_id AND #sk BETWEEN :start AND :end",
-                ExpressionAttributeNames={"#pk": "partKey", "#sk": "sortKey"},
-                ExpressionAttributeValues={
-                    ":sensor_id": {"S": sensor["sensorId"]},
-                    # Timestamps are stored as Numbers in DynamoDB
-                    ":start": {"N": str(start_timestamp)},
-                    ":end": {"N": str(end_timestamp)},
-                },
-            )
-            for item in response.get("Items", []):
-                # Ensure sortKey is handled correctly, it's a string from DynamoDB
-                timestamp_str = item["sortKey"]["N"]
-                measurement = {
-                    "spaceName": sensor["spaceName"],
-                    "sensor_id": item["partKey"]["S"],
-                    "timestamp": timestamp_str,
-                }
-                for key, value in item.items():
-                    if key not in ["partKey", "sortKey"] and "N" in value:
-                        # Convert DynamoDB Number string to Python float
-                        measurement[key] = float(value["N"])
-                all_measurements.append(measurement)
+            measurements, last_key = future.result()
+            all_measurements.extend(measurements)
+            if last_key:
+                last_keys[sensor["sensorId"]] = last_key
         except ClientError as e:
-            print(
-                f"Error querying sensor {sensor['sensorId']}: {e.response['Error']['Message']}"
-            )
+            message = e.response["Error"]["Message"]
+            print(f"Error querying sensor {sensor['sensorId']}: {message}")
+            errors.append(f"Error querying sensor {sensor['sensorId']}: {message}")
         except Exception as e:
             print(
                 f"General error processing DynamoDB results for {sensor['sensorId']}: {e}"
             )
+            errors.append(f"Error querying sensor {sensor['sensorId']}: {e}")
 
-    return all_measurements
+    return all_measurements, errors, last_keys
+
+
+def pending_keys(values, last_keys):
+    # Resume keys of the sensors in this group that still have more data
+    return {
+        sid: last_keys[sid]
+        for sid in {v["sensor_id"] for v in values}
+        if sid in last_keys
+    }
+
+
+def encode_cursor(last_keys):
+    return base64.urlsafe_b64encode(json.dumps(last_keys).encode()).decode()
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
 
 
 def iso_to_timestamp(iso_string):
@@ -381,15 +509,16 @@ def graphql_server():
         query = data.get("query")
         # Ensure variables are handled if present
         variables = data.get("variables")
-        result = schema.execute(query, variables=variables)
+        # Resolvers add partial failures (e.g. a sensor query timing out) here
+        context = {"errors": []}
+        result = schema.execute(query, variables=variables, context_value=context)
 
-        if result.errors:
+        errors = [str(e) for e in result.errors or []] + context["errors"]
+        if errors:
             # Log errors for debugging
-            print(f"GraphQL Errors: {result.errors}")
+            print(f"GraphQL Errors: {errors}")
             # Return errors in the response
-            return jsonify(
-                {"data": result.data, "errors": [str(e) for e in result.errors]}
-            )
+            return jsonify({"data": result.data, "errors": errors})
 
         return jsonify(result.data)
     except Exception as e:
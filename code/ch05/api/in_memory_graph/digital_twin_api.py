@@ -1,20 +1,63 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import graphene
-from graphene import ObjectType, String, List, Float
+from graphene import ObjectType, String, List, Float, Boolean, Int
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter, defaultdict
+import base64
+import json
+import os
+import time
+
+import numpy as np
+
+from downsample import reduce_series
+from measurement_cache import MeasurementCache
 
 # --- Database Initialization ---
+# Sensors are queried concurrently through one shared client; the pool size
+# bounds how many queries are in flight. Each sensor stops paging once its
+# query has run for DYNAMO_QUERY_TIMEOUT seconds and returns the rows read so
+# far with a cursor, so it holds a pool thread for at most about twice that
+# (the deadline plus the page request in flight, retries included).
+DYNAMO_MAX_CONCURRENCY = int(os.environ.get("DYNAMO_MAX_CONCURRENCY", "16"))
+DYNAMO_QUERY_TIMEOUT = float(os.environ.get("DYNAMO_QUERY_TIMEOUT", "5"))
+# Attempts per page request (the first one plus retries), which share the timeout
+DYNAMO_MAX_ATTEMPTS = int(os.environ.get("DYNAMO_MAX_ATTEMPTS", "2"))
+# Each query page is at most 1 MB, so this caps the data read per sensor per
+# request. Sensors with more data return a cursor to fetch the next pages.
+DYNAMO_PAGE_BUDGET = int(os.environ.get("DYNAMO_PAGE_BUDGET", "10"))
+# Set to e.g. http://localhost:8000 to run against DynamoDB Local
+DYNAMO_ENDPOINT_URL = os.environ.get("DYNAMO_ENDPOINT_URL")
+
 try:
-    dynamodb = boto3.client("dynamodb", region_name="us-east-1")
+    dynamodb = boto3.client(
+        "dynamodb",
+        region_name="us-east-1",
+        endpoint_url=DYNAMO_ENDPOINT_URL,
+        config=Config(
+            max_pool_connections=DYNAMO_MAX_CONCURRENCY,
+            connect_timeout=DYNAMO_QUERY_TIMEOUT / DYNAMO_MAX_ATTEMPTS,
+            read_timeout=DYNAMO_QUERY_TIMEOUT / DYNAMO_MAX_ATTEMPTS,
+            retries={"total_max_attempts": DYNAMO_MAX_ATTEMPTS, "mode": "standard"},
+        ),
+    )
     print("Successfully connected to DynamoDB.")
 except ClientError as e:
     print(f"Error connecting to DynamoDB: {e}")
     dynamodb = None
 
+dynamo_pool = ThreadPoolExecutor(max_workers=DYNAMO_MAX_CONCURRENCY)
+
+# Completed hours of readings are kept in memory, so repeated queries over
+# recent history only read the current hour from DynamoDB. 0 disables it.
+MEASUREMENT_CACHE_MB = int(os.environ.get("MEASUREMENT_CACHE_MB", "64"))
+measurement_cache = MeasurementCache(max_bytes=MEASUREMENT_CACHE_MB * 1024 * 1024)
+
 # --- In-Memory Graph Data ---
 IN_MEMORY_GRAPH = {
     "742 Evergreen Terrace": {
@@ -246,10 +289,27 @@ class Measurement(ObjectType):
 
 
 class MeasurementGroup(ObjectType):
-    name, unit, values = (
+    name, unit, values, has_more, cursor = (
         String(required=True),
         String(),
         List(Measurement, required=True),
+        Boolean(required=True),
+        String(),
+    )
+
+
+# Columnar alternative to MeasurementGroup: one pair of parallel arrays per
+# sensor and measurement name instead of one object per reading
+class MeasurementSeries(ObjectType):
+    sensor_id, name, unit, timestamps, values, delta_encoded, has_more, cursor = (
+        String(required=True),
+        String(required=True),
+        String(),
+        List(Float, required=True),
+        List(Float, required=True),
+        Boolean(required=True),
+        Boolean(required=True),
+        String(),
     )
 
 
@@ -279,6 +339,31 @@ class Space(ObjectType):
         List(Image, required=True),
         List(MeasurementGroup, required=True),
     )
+    # With deltaEncoded the first timestamp is absolute and the rest are the
+    # gaps to the previous reading, which are short and repeat for regular data
+    series = List(
+        MeasurementSeries, required=True, delta_encoded=Boolean(default_value=False)
+    )
+
+    # Readings are only turned into GraphQL objects for the fields requested
+    def resolve_measurements(parent, info):
+        return [
+            MeasurementGroup(
+                name=m_type,
+                unit=get_unit(m_type),
+                values=build_measurements(series, parent["reduce_args"]),
+                has_more=bool(pending := pending_keys(series, parent["last_keys"])),
+                cursor=encode_cursor(pending) if pending else None,
+            )
+            for m_type, series in parent["readings"].items()
+        ]
+
+    def resolve_series(parent, info, delta_encoded):
+        return [
+            build_series(sid, m_type, points, parent, delta_encoded)
+            for m_type, series in parent["readings"].items()
+            for sid, points in series.items()
+        ]
 
 
 class TreeNode(ObjectType):
@@ -292,47 +377,46 @@ class Query(ObjectType):
         space=String(required=True),
         start_date=String(required=True),
         end_date=String(required=True),
+        cursor=String(),
+        resolution=String(),
+        aggregate=String(default_value="mean"),
+        simplify=String(),
+        max_points=Int(),
+        epsilon=Float(),
     )
     tree = graphene.Field(TreeNode, root_node=String(required=True))
 
     def resolve_tree(self, info, root_node):
         return build_in_memory_tree(root_node)
 
-    def resolve_spaces(self, info, space, start_date, end_date):
+    def resolve_spaces(
+        self, info, space, start_date, end_date, cursor=None, **reduce_args
+    ):
         if not dynamodb or not (descendants := get_all_descendants(space)):
             return []
 
         sensors, docs, imgs = [], [], []
         for node in descendants:
-            data = IN_MEMORY_GRAPH.get(node, {})
-            sensors.extend(
-                [
-                    {
-                        "spaceName": node,
-                        "sensorId": s.get("sensorId"),
-                        "name": s.get("name"),
-                        "sensorX": s.get("x"),
-                        "sensorY": s.get("y"),
-                    }
-                    for s in data.get("sensors", [])
-                ]
-            )
-            docs.extend(
-                [
-                    {"spaceName": node, "documentUrl": d["url"]}
-                    for d in data.get("documents", [])
-                ]
-            )
-            imgs.extend(
-                [
-                    {"spaceName": node, "imageUrl": i["url"]}
-                    for i in data.get("images", [])
-                ]
-            )
-
-        measurements = get_sensor_measurements_from_dynamo(
-            sensors, iso_to_ts(start_date), iso_to_ts(end_date)
+            sensors.extend(GRAPH_INDEX["sensors"][node])
+            docs.extend(GRAPH_INDEX["documents"][node])
+            imgs.extend(GRAPH_INDEX["images"][node])
+
+        # A cursor resumes only the sensors that had more data, from where they left off
+        if cursor:
+            start_keys = {
+                sid: key
+                for sid, key in decode_cursor(cursor).items()
+                if sid in GRAPH_INDEX["sensor_map"]
+                and is_descendant(GRAPH_INDEX["sensor_map"][sid]["spaceName"], space)
+            }
+            query_sensors = [GRAPH_INDEX["sensor_map"][sid] for sid in start_keys]
+        else:
+            start_keys, query_sensors = {}, sensors
+        measurements, errors, last_keys = get_sensor_measurements_from_dynamo(
+            query_sensors, iso_to_ts(start_date), iso_to_ts(end_date), start_keys
         )
+        # Failed sensors don't fail the query, they are reported in "errors"
+        info.context.setdefault("errors", []).extend(errors)
 
         # Using defaultdict for automatic and concise nested grouping
         spaces_data = defaultdict(
@@ -340,7 +424,7 @@ class Query(ObjectType):
                 "sensors": set(),
                 "documents": set(),
                 "images": set(),
-                "measurements": defaultdict(list),
+                "measurements": defaultdict(lambda: defaultdict(list)),
             }
         )
 
@@ -351,17 +435,17 @@ class Query(ObjectType):
         for i in imgs:
             spaces_data[i["spaceName"]]["images"].add(i["imageUrl"])
 
+        # Rows may be shared with the measurement cache, so they are only read
         for m in measurements:
-            sn, sid, ts = m.pop("spaceName"), m.pop("sensor_id"), m.pop("timestamp")
+            sn, sid, ts = m["spaceName"], m["sensor_id"], m["timestamp"]
             spaces_data[sn]["sensors"].add(sid)
             for k, v in m.items():
-                spaces_data[sn]["measurements"][k].append(
-                    {"sensor_id": sid, "timestamp": ts, "value": float(v)}
-                )
+                if k not in ["spaceName", "sensor_id", "timestamp"]:
+                    spaces_data[sn]["measurements"][k][sid].append((ts, float(v)))
 
-        sensor_map = {s["sensorId"]: s for s in sensors}
+        sensor_map = GRAPH_INDEX["sensor_map"]
         return [
-            Space(
+            dict(
                 name=name,
                 sensors=[
                     Sensor(
@@ -377,78 +461,273 @@ class Query(ObjectType):
                     Document(id=url, space=name, url=url) for url in data["documents"]
                 ],
                 images=[Image(id=url, space=name, url=url) for url in data["images"]],
-                measurements=[
-                    MeasurementGroup(
-                        name=m_type,
-                        unit=get_unit(m_type),
-                        values=[Measurement(**val) for val in vals],
-                    )
-                    for m_type, vals in data["measurements"].items()
-                ],
+                readings=data["measurements"],
+                reduce_args=reduce_args,
+                last_keys=last_keys,
             )
             for name, data in spaces_data.items()
         ]
 
 
 # --- Helper Functions ---
+def build_graph_index(graph):
+    # Built once when the graph is loaded so requests never walk the graph.
+    # An iterative depth-first walk gives every node an Euler tour interval
+    # [enter, exit): the descendants of a node are the contiguous slice
+    # order[enter:exit], and "is descendant" is two comparisons.
+    children = {
+        name: sorted(c for c in data.get("children", []) if c in graph)
+        for name, data in graph.items()
+    }
+    parent_counts = Counter(c for names in children.values() for c in names)
+    order, enter, exit_, post_order = [], {}, {}, []
+
+    def walk(root):
+        stack = [(root, False)]
+        while stack:
+            node, finished = stack.pop()
+            if finished:
+                exit_[node] = len(order)
+                post_order.append(node)
+            elif node not in enter:
+                enter[node] = len(order)
+                order.append(node)
+                stack.append((node, True))
+                stack.extend((c, False) for c in reversed(children[node]))
+
+    for root in [n for n in graph if n not in parent_counts]:
+        walk(root)
+    # The intervals only hold for a forest. A node with more than one parent
+    # would only be in the interval of the first one, and a cycle has nodes
+    # no root reaches: those graphs are walked on every request instead.
+    forest = len(enter) == len(graph) and all(
+        count == 1 for count in parent_counts.values()
+    )
+    for node in graph:
+        walk(node)
+
+    # Children are built before their parents, so each tree is built once
+    tree = {}
+    for node in post_order:
+        tree[node] = TreeNode(
+            name=node,
+            label=graph[node].get("label", "Entity"),
+            children=[tree[c] for c in children[node] if c in tree],
+        )
+
+    sensors = {
+        node: [
+            {
+                "spaceName": node,
+                "sensorId": s.get("sensorId"),
+                "name": s.get("name"),
+                "sensorX": s.get("x"),
+                "sensorY": s.get("y"),
+            }
+            for s in data.get("sensors", [])
+        ]
+        for node, data in graph.items()
+    }
+    return {
+        "forest": forest,
+        "children": children,
+        "order": order,
+        "enter": enter,
+        "exit": exit_,
+        "tree": tree,
+        "sensors": sensors,
+        "sensor_map": {s["sensorId"]: s for rows in sensors.values() for s in rows},
+        "documents": {
+            node: [
+                {"spaceName": node, "documentUrl": d["url"]}
+                for d in data.get("documents", [])
+            ]
+            for node, data in graph.items()
+        },
+        "images": {
+            node: [
+                {"spaceName": node, "imageUrl": i["url"]}
+                for i in data.get("images", [])
+            ]
+            for node, data in graph.items()
+        },
+    }
+
+
 def build_in_memory_tree(node_name):
-    if node_name not in IN_MEMORY_GRAPH:
-        return None
-    node_data = IN_MEMORY_GRAPH[node_name]
-    children = sorted(
-        [
-            c
-            for name in node_data.get("children", [])
-            if (c := build_in_memory_tree(name))
-        ],
-        key=lambda x: x.name,
+    return GRAPH_INDEX["tree"].get(node_name)
+
+
+def walk_descendants(start_node):
+    """The node and its descendants in depth-first order, each node once."""
+    children = GRAPH_INDEX["children"]
+    visited, stack = {}, [start_node]
+    while stack:
+        node = stack.pop()
+        if node not in visited:
+            visited[node] = None
+            stack.extend(reversed(children[node]))
+    return list(visited)
+
+
+def get_all_descendants(start_node):
+    if start_node not in GRAPH_INDEX["enter"]:
+        return []
+    if not GRAPH_INDEX["forest"]:
+        return walk_descendants(start_node)
+    return GRAPH_INDEX["order"][
+        GRAPH_INDEX["enter"][start_node] : GRAPH_INDEX["exit"][start_node]
+    ]
+
+
+def is_descendant(node, ancestor):
+    enter, exit_ = GRAPH_INDEX["enter"], GRAPH_INDEX["exit"]
+    if node not in enter or ancestor not in enter:
+        return False
+    if not GRAPH_INDEX["forest"]:
+        return node in walk_descendants(ancestor)
+    return enter[ancestor] <= enter[node] < exit_[ancestor]
+
+
+# Follows LastEvaluatedKey so windows with more than 1 MB of data aren't truncated
+def paginate_sensor_query(sensor_id, start_ts, end_ts, start_key=None, deadline=None):
+    params = {
+        "TableName": "sensor-data",
+        "KeyConditionExpression": "#pk = :sid AND #sk BETWEEN :start AND :end",
+        "ExpressionAttributeNames": {"#pk": "partKey", "#sk": "sortKey"},
+        "ExpressionAttributeValues": {
+            ":sid": {"S": sensor_id},
+            ":start": {"N": start_ts},
+            ":end": {"N": end_ts},
+        },
+    }
+    for _ in range(DYNAMO_PAGE_BUDGET):
+        if start_key:
+            params["ExclusiveStartKey"] = start_key
+        page = dynamodb.query(**params)
+        yield page
+        if not (start_key := page.get("LastEvaluatedKey")):
+            return
+        if deadline is not None and time.monotonic() >= deadline:
+            # Out of time, the LastEvaluatedKey of this page is the cursor
+            return
+
+
+def decode_measurements(sensor, items):
+    for item in items:
+        m = {
+            "spaceName": sensor["spaceName"],
+            "sensor_id": item["partKey"]["S"],
+            "timestamp": item["sortKey"]["N"],
+        }
+        m.update(
+            {
+                k: float(v["N"])
+                for k, v in item.items()
+                if k not in ["partKey", "sortKey"] and "N" in v
+            }
+        )
+        yield m
+
+
+def query_sensor(sensor, start_ts, end_ts, start_key=None):
+    # Shared by all the ranges the cache reads for this sensor
+    deadline = time.monotonic() + DYNAMO_QUERY_TIMEOUT
+    if MEASUREMENT_CACHE_MB and not start_key:
+        return measurement_cache.read_through(
+            sensor["sensorId"],
+            start_ts,
+            end_ts,
+            lambda range_start, range_end: fetch_sensor(
+                sensor, range_start, range_end, deadline=deadline
+            ),
+        )
+    return fetch_sensor(sensor, start_ts, end_ts, start_key, deadline)
+
+
+def fetch_sensor(sensor, start_ts, end_ts, start_key=None, deadline=None):
+    measurements, last_key = [], None
+    pages = paginate_sensor_query(
+        sensor["sensorId"], start_ts, end_ts, start_key, deadline
     )
-    return TreeNode(
-        name=node_name, label=node_data.get("label", "Entity"), children=children
+    for page in pages:
+        measurements.extend(decode_measurements(sensor, page.get("Items", [])))
+        last_key = page.get("LastEvaluatedKey")
+    # last_key is only set if the page budget or the deadline ran out before
+    # the end of the window
+    return measurements, last_key
+
+
+def get_sensor_measurements_from_dynamo(sensors, start_ts, end_ts, start_keys=None):
+    start_keys = start_keys or {}
+    futures = {
+        dynamo_pool.submit(
+            query_sensor, s, start_ts, end_ts, start_keys.get(s["sensorId"])
+        ): s
+        for s in sensors
+    }
+    # Every query stops at its own deadline (see query_sensor), so waiting for
+    # the results is bounded too
+    all_measurements, errors, last_keys = [], [], {}
+    for future, sensor in futures.items():
+        if e := future.exception():
+            print(f"Dynamo Error: {e}")
+            errors.append(f"Error querying sensor {sensor['sensorId']}: {e}")
+        else:
+            measurements, last_key = future.result()
+            all_measurements.extend(measurements)
+            if last_key:
+                last_keys[sensor["sensorId"]] = last_key
+    return all_measurements, errors, last_keys
+
+
+def pending_keys(sensor_ids, last_keys):
+    return {sid: last_keys[sid] for sid in sensor_ids if sid in last_keys}
+
+
+def build_measurements(series, reduce_args):
+    # series maps sensor id -> [(timestamp, value)]. Without a resolution or
+    # simplification the raw readings are returned as they came from DynamoDB.
+    if not reduce_args.get("resolution") and not reduce_args.get("simplify"):
+        return [
+            Measurement(sensor_id=sid, timestamp=ts, value=value)
+            for sid, points in series.items()
+            for ts, value in points
+        ]
+    measurements = []
+    for sid, points in series.items():
+        timestamps, values = reduce_series(*zip(*points), **reduce_args)
+        measurements.extend(
+            Measurement(sensor_id=sid, timestamp=str(ts), value=value)
+            for ts, value in zip(timestamps.tolist(), values.tolist())
+        )
+    return measurements
+
+
+def build_series(sid, m_type, points, space, delta_encoded):
+    timestamps, values = reduce_series(*zip(*points), **space["reduce_args"])
+    timestamps = timestamps.astype(np.float64)
+    if delta_encoded:
+        timestamps[1:] = np.diff(timestamps)
+    pending = pending_keys([sid], space["last_keys"])
+    return MeasurementSeries(
+        sensor_id=sid,
+        name=m_type,
+        unit=get_unit(m_type),
+        timestamps=timestamps.tolist(),
+        values=values.tolist(),
+        delta_encoded=delta_encoded,
+        has_more=bool(pending),
+        cursor=encode_cursor(pending) if pending else None,
     )
 
 
-def get_all_descendants(start_node, visited=None):
-    visited = visited or set()
-    if start_node not in IN_MEMORY_GRAPH or start_node in visited:
-        return visited
-    visited.add(start_node)
-    for child in IN_MEMORY_GRAPH[start_node].get("children", []):
-        get_all_descendants(child, visited)
-    return visited
-
-
-def get_sensor_measurements_from_dynamo(sensors, start_ts, end_ts):
-    all_measurements = []
-    for sensor in sensors:
-        try:
-            res = dynamodb.query(
-                TableName="sensor-data",
-                KeyConditionExpression="#pk = :sid AND #sk BETWEEN :start AND :end",
-                ExpressionAttributeNames={"#pk": "partKey", "#sk": "sortKey"},
-                ExpressionAttributeValues={
-                    ":sid": {"S": sensor["sensorId"]},
-                    ":start": {"N": start_ts},
-                    ":end": {"N": end_ts},
-                },
-            )
-            for item in res.get("Items", []):
-                m = {
-                    "spaceName": sensor["spaceName"],
-                    "sensor_id": item["partKey"]["S"],
-                    "timestamp": item["sortKey"]["N"],
-                }
-                m.update(
-                    {
-                        k: float(v["N"])
-                        for k, v in item.items()
-                        if k not in ["partKey", "sortKey"] and "N" in v
-                    }
-                )
-                all_measurements.append(m)
-        except Exception as e:
-            print(f"Dynamo Error: {e}")
-    return all_measurements
+def encode_cursor(last_keys):
+    return base64.urlsafe_b64encode(json.dumps(last_keys).encode()).decode()
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
 
 
 def iso_to_ts(iso_str):
@@ -468,20 +747,30 @@ def get_unit(m_type):
     }.get(m_type.lower(), "units")
 
 
+GRAPH_INDEX = build_graph_index(IN_MEMORY_GRAPH)
+
+
 # --- Flask App ---
 app = Flask(__name__)
 CORS(app)
 schema = graphene.Schema(query=Query)
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify({"measurementCache": measurement_cache.stats()})
+
+
 @app.route("/graphql", methods=["POST"])
 def graphql_server():
     data = request.get_json()
-    result = schema.execute(data.get("query"), variables=data.get("variables"))
+    context = {"errors": []}
+    result = schema.execute(
+        data.get("query"), variables=data.get("variables"), context_value=context
+    )
+    errors = [str(e) for e in result.errors or []] + context["errors"]
     return jsonify(
-        {"data": result.data, "errors": [str(e) for e in result.errors]}
-        if result.errors
-        else {"data": result.data}
+        {"data": result.data, "errors": errors} if errors else {"data": result.data}
     ), (400 if result.errors else 200)
 
 
@@ -0,0 +1,124 @@
+import re
+
+import numpy as np
+
+AGGREGATES = {
+    "mean": lambda values, starts, counts: np.add.reduceat(values, starts) / counts,
+    "min": lambda values, starts, counts: np.minimum.reduceat(values, starts),
+    "max": lambda values, starts, counts: np.maximum.reduceat(values, starts),
+    "last": lambda values, starts, counts: values[starts + counts - 1],
+}
+
+RESOLUTION_UNITS_MS = {"s": 1000, "m": 60_000, "h": 3_600_000, "d": 86_400_000}
+
+
+def parse_resolution(resolution):
+    # "30s", "15m", "1h", "1d" -> bucket width in milliseconds
+    match = re.fullmatch(r"(\d+)([smhd])", resolution.strip())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(
+            f"Invalid resolution '{resolution}', expected e.g. 30s, 15m, 1h or 1d"
+        )
+    return int(match.group(1)) * RESOLUTION_UNITS_MS[match.group(2)]
+
+
+def bucket(timestamps, values, resolution_ms, aggregate="mean"):
+    if aggregate not in AGGREGATES:
+        raise ValueError(
+            f"Invalid aggregate '{aggregate}', expected one of {', '.join(AGGREGATES)}"
+        )
+    buckets = timestamps // resolution_ms * resolution_ms
+    # reduceat works on contiguous runs, so each bucket becomes one slice
+    bucket_starts, starts, counts = np.unique(
+        buckets, return_index=True, return_counts=True
+    )
+    return bucket_starts, AGGREGATES[aggregate](values, starts, counts)
+
+
+def lttb(timestamps, values, max_points):
+    # Largest-Triangle-Three-Buckets: keep the point of each bucket that forms
+    # the largest triangle with the previously kept point and the next bucket's mean
+    n = len(timestamps)
+    if max_points >= n or max_points < 3:
+        return timestamps, values
+
+    x, y = timestamps.astype(np.float64), values
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        keep[i + 1] = a
+    return timestamps[keep], values[keep]
+
+
+def rdp(timestamps, values, epsilon):
+    # Ramer-Douglas-Peucker (see chapter 6), iterative so long series can't hit
+    # the recursion limit. Time is in ms, so the distance is effectively in
+    # measurement units and epsilon is the largest error allowed on a value.
+    n = len(timestamps)
+    if n < 3:
+        return timestamps, values
+
+    x, y = timestamps.astype(np.float64), values
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    segments = [(0, n - 1)]
+    while segments:
+        start, end = segments.pop()
+        if end - start < 2:
+            continue
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        inner_x, inner_y = x[start + 1 : end], y[start + 1 : end]
+        if (length := np.hypot(dx, dy)) == 0:
+            distances = np.hypot(inner_x - x[start], inner_y - y[start])
+        else:
+            distances = (
+                np.abs(dy * (inner_x - x[start]) - dx * (inner_y - y[start])) / length
+            )
+        i = int(np.argmax(distances))
+        if distances[i] > epsilon:
+            split = start + 1 + i
+            keep[split] = True
+            segments.extend([(start, split), (split, end)])
+    return timestamps[keep], values[keep]
+
+
+def reduce_series(
+    timestamps,
+    values,
+    resolution=None,
+    aggregate="mean",
+    simplify=None,
+    max_points=None,
+    epsilon=None,
+):
+    timestamps = np.asarray(timestamps, dtype=np.float64).astype(np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    order = np.argsort(timestamps, kind="stable")
+    timestamps, values = timestamps[order], values[order]
+
+    if resolution:
+        timestamps, values = bucket(
+            timestamps, values, parse_resolution(resolution), aggregate
+        )
+    if simplify == "lttb":
+        if not max_points:
+            raise ValueError("The lttb simplification needs maxPoints")
+        timestamps, values = lttb(timestamps, values, max_points)
+    elif simplify == "rdp":
+        if epsilon is None:
+            raise ValueError("The rdp simplification needs epsilon")
+        timestamps, values = rdp(timestamps, values, epsilon)
+    elif simplify:
+        raise ValueError(f"Invalid simplify '{simplify}', expected lttb or rdp")
+    return timestamps, values
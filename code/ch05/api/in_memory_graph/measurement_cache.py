@@ -0,0 +1,152 @@
+import bisect
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+HOUR_MS = 3_600_000
+
+
+def row_size(row):
+    # Rough size of a decoded measurement row, used for the byte budget
+    return sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row.values())
+
+
+class MeasurementCache:
+    """In-process LRU cache of measurement rows, per sensor per time bucket.
+
+    Only buckets that have ended (plus a settle time for late readings) are
+    cached, since their readings can no longer change. The bucket that is
+    still open and any buckets that aren't cached yet are read from DynamoDB.
+
+    Buckets without readings aren't LRU entries, each sensor keeps the time
+    spans known to be empty instead, merged where they touch. A gap of weeks
+    is one span rather than hundreds of empty buckets using up the budget.
+    """
+
+    def __init__(self, max_bytes, bucket_ms=HOUR_MS, settle_ms=5 * 60_000):
+        self.max_bytes = max_bytes
+        self.bucket_ms = bucket_ms
+        self.settle_ms = settle_ms
+        self._buckets = OrderedDict()
+        # sensor_id -> sorted, non-overlapping (start, end) spans without readings
+        self._empty_spans = {}
+        self._lock = threading.Lock()
+        self.bytes = self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "buckets": len(self._buckets),
+                "emptySpans": sum(len(s) for s in self._empty_spans.values()),
+                "bytes": self.bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _is_empty(self, sensor_id, bucket):
+        spans = self._empty_spans.get(sensor_id, [])
+        i = bisect.bisect_right(spans, (bucket, float("inf"))) - 1
+        return i >= 0 and spans[i][0] <= bucket < spans[i][1]
+
+    def _put_empty(self, sensor_id, start, end):
+        with self._lock:
+            spans = self._empty_spans.setdefault(sensor_id, [])
+            # Replace the spans that overlap or touch [start, end) by their union
+            i = bisect.bisect_left(spans, (start,))
+            if i > 0 and spans[i - 1][1] >= start:
+                i -= 1
+            j = i
+            while j < len(spans) and spans[j][0] <= end:
+                start, end = min(start, spans[j][0]), max(end, spans[j][1])
+                j += 1
+            spans[i:j] = [(start, end)]
+
+    def _get(self, key):
+        with self._lock:
+            if self._is_empty(*key):
+                self.hits += 1
+                return []
+            if key not in self._buckets:
+                self.misses += 1
+                return None
+            self._buckets.move_to_end(key)
+            self.hits += 1
+            return self._buckets[key][0]
+
+    def _put(self, key, rows):
+        if not rows:
+            sensor_id, bucket = key
+            self._put_empty(sensor_id, bucket, bucket + self.bucket_ms)
+            return
+        size = sys.getsizeof(rows) + sum(row_size(r) for r in rows)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._buckets:
+                self.bytes -= self._buckets.pop(key)[1]
+            self._buckets[key] = (rows, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self.bytes -= self._buckets.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def read_through(self, sensor_id, start_ts, end_ts, fetch):
+        """Return (rows, last_key) for one sensor between start_ts and end_ts.
+
+        fetch(range_start, range_end) reads the rows of a time range from
+        DynamoDB and returns them with the LastEvaluatedKey of the last page,
+        which is only set if the range was cut short by the page budget.
+        """
+        start, end, size = int(start_ts), int(end_ts), self.bucket_ms
+        settled = time.time() * 1000 - self.settle_ms
+        buckets = range(start // size * size, end // size * size + size, size)
+
+        rows_by_bucket = {}
+        for b in buckets:
+            if b + size <= settled and (rows := self._get((sensor_id, b))) is not None:
+                rows_by_bucket[b] = rows
+            elif b + size > settled:
+                with self._lock:
+                    self.misses += 1
+
+        # Missing buckets next to each other are read with a single query
+        runs = []
+        for b in buckets:
+            if b in rows_by_bucket:
+                continue
+            if runs and runs[-1][1] == b:
+                runs[-1][1] = b + size
+            else:
+                runs.append([b, b + size])
+
+        last_key, cut_off = None, None
+        for run_start, run_end in runs:
+            rows, last_key = fetch(str(run_start), str(run_end - 1))
+            for b in range(run_start, run_end, size):
+                rows_by_bucket[b] = []
+            for row in rows:
+                rows_by_bucket[int(float(row["timestamp"])) // size * size].append(row)
+            if last_key:
+                # Only rows up to the last one read are returned, the cursor
+                # resumes from there. Its bucket and later ones are incomplete.
+                cut_off = int(float(rows[-1]["timestamp"])) if rows else run_start
+                run_end = cut_off // size * size
+            for b in range(run_start, run_end, size):
+                if b + size <= settled:
+                    self._put((sensor_id, b), rows_by_bucket[b])
+            if last_key:
+                break
+
+        if cut_off is not None:
+            end = min(end, cut_off)
+        return [
+            row
+            for b in buckets
+            for row in rows_by_bucket.get(b, [])
+            if start <= int(float(row["timestamp"])) <= end
+        ], last_key
@@ -0,0 +1,65 @@
+"""
+Tests of the graph index of digital_twin_api.py. Run them with:
+python -m pytest test_digital_twin_api.py
+"""
+
+import pytest
+
+import digital_twin_api as api
+
+# The kitchen and the laundry share a wall, which is a child of both
+SHARED_CHILD_GRAPH = {
+    "House": {"children": ["Kitchen", "Laundry"]},
+    "Kitchen": {"children": ["Shared wall", "Oven"]},
+    "Laundry": {"children": ["Shared wall"]},
+    "Shared wall": {"children": ["Wall sensor"]},
+    "Oven": {},
+    "Wall sensor": {},
+}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    def use(graph):
+        monkeypatch.setattr(api, "GRAPH_INDEX", api.build_graph_index(graph))
+        return api.GRAPH_INDEX
+
+    return use
+
+
+def test_home_graph_is_indexed_as_a_forest(index):
+    assert index(api.IN_MEMORY_GRAPH)["forest"]
+    for node in api.IN_MEMORY_GRAPH:
+        assert api.get_all_descendants(node) == api.walk_descendants(node)
+
+
+def test_shared_child_is_a_descendant_of_both_parents(index):
+    assert not index(SHARED_CHILD_GRAPH)["forest"]
+
+    for parent in ("Kitchen", "Laundry"):
+        descendants = api.get_all_descendants(parent)
+        assert "Shared wall" in descendants
+        assert "Wall sensor" in descendants
+        assert api.is_descendant("Wall sensor", parent)
+    assert sorted(api.get_all_descendants("Laundry")) == [
+        "Laundry",
+        "Shared wall",
+        "Wall sensor",
+    ]
+    assert len(api.get_all_descendants("House")) == len(SHARED_CHILD_GRAPH)
+    assert not api.is_descendant("Oven", "Laundry")
+
+
+def test_shared_child_is_in_the_tree_of_both_parents(index):
+    index(SHARED_CHILD_GRAPH)
+
+    for parent in ("Kitchen", "Laundry"):
+        tree = api.build_in_memory_tree(parent)
+        assert "Shared wall" in [child.name for child in tree.children]
+
+
+def test_cycle_is_walked_once(index):
+    index({"A": {"children": ["B"]}, "B": {"children": ["A"]}})
+
+    assert sorted(api.get_all_descendants("B")) == ["A", "B"]
+    assert api.is_descendant("B", "A") and api.is_descendant("A", "B")
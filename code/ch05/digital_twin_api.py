@@ -1,25 +1,54 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import graphene
-from graphene import ObjectType, String, List, Float
+from graphene import ObjectType, String, List, Float, Boolean
 from neo4j import GraphDatabase, basic_auth, exceptions as neo4j_exceptions
 import boto3
 from datetime import datetime
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+import base64
+import json
 import os
+import time
 from typing import Dict, Any
 
 # --- Database Initialization ---
+# Sensors are queried concurrently through one shared client; the pool size
+# bounds how many queries are in flight. Each sensor stops paging once its
+# query has run for DYNAMO_QUERY_TIMEOUT seconds and returns the rows read so
+# far with a cursor, so it holds a pool thread for at most about twice that
+# (the deadline plus the page request in flight, retries included).
+DYNAMO_MAX_CONCURRENCY = int(os.environ.get("DYNAMO_MAX_CONCURRENCY", "16"))
+DYNAMO_QUERY_TIMEOUT = float(os.environ.get("DYNAMO_QUERY_TIMEOUT", "5"))
+# Attempts per page request (the first one plus retries), which share the timeout
+DYNAMO_MAX_ATTEMPTS = int(os.environ.get("DYNAMO_MAX_ATTEMPTS", "2"))
+# Each query page is at most 1 MB, so this caps the data read per sensor per
+# request. Sensors with more data return a cursor to fetch the next pages.
+DYNAMO_PAGE_BUDGET = int(os.environ.get("DYNAMO_PAGE_BUDGET", "10"))
+# Set to e.g. http://localhost:8000 to run against DynamoDB Local
+DYNAMO_ENDPOINT_URL = os.environ.get("DYNAMO_ENDPOINT_URL")
+
 try:
     dynamodb = boto3.client(
         "dynamodb",
         region_name="us-east-1",
+        endpoint_url=DYNAMO_ENDPOINT_URL,
+        config=Config(
+            max_pool_connections=DYNAMO_MAX_CONCURRENCY,
+            connect_timeout=DYNAMO_QUERY_TIMEOUT / DYNAMO_MAX_ATTEMPTS,
+            read_timeout=DYNAMO_QUERY_TIMEOUT / DYNAMO_MAX_ATTEMPTS,
+            retries={"total_max_attempts": DYNAMO_MAX_ATTEMPTS, "mode": "standard"},
+        ),
     )
     print("Successfully connected to DynamoDB.")
 except ClientError as e:
     print(f"Error connecting to DynamoDB: {e}")
     dynamodb = None
 
+dynamo_pool = ThreadPoolExecutor(max_workers=DYNAMO_MAX_CONCURRENCY)
+
 NEO4J_URI = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
 
 try:
@@ -43,6 +72,8 @@ class MeasurementGroup(ObjectType):
     name = String(required=True)
     unit = String()
     values = List(Measurement, required=True)
+    has_more = Boolean(required=True)
+    cursor = String()
 
 
 class Sensor(ObjectType):
@@ -87,6 +118,7 @@ class Query(ObjectType):
         space=String(required=True),
         start_date=String(required=True),
         end_date=String(required=True),
+        cursor=String(),
     )
 
     tree = graphene.Field(TreeNode, root_node=String(required=True))
@@ -109,7 +141,7 @@ class Query(ObjectType):
             print(f"Hierarchy Error: {e}")
             return None
 
-    def resolve_spaces(self, info, space, start_date, end_date):
+    def resolve_spaces(self, info, space, start_date, end_date, cursor=None):
         if not driver or not dynamodb:
             return []
 
@@ -173,9 +205,16 @@ class Query(ObjectType):
 
         start_ts = iso_to_timestamp(start_date)
         end_ts = iso_to_timestamp(end_date)
-        all_measurements = get_sensor_measurements_from_dynamo(
-            memgraph_sensors, start_ts, end_ts
+        # A cursor resumes only the sensors that had more data, from where they left off
+        start_keys = decode_cursor(cursor) if cursor else {}
+        all_measurements, errors, last_keys = get_sensor_measurements_from_dynamo(
+            [s for s in memgraph_sensors if not cursor or s["sensorId"] in start_keys],
+            start_ts,
+            end_ts,
+            start_keys,
         )
+        # Failed sensors don't fail the query, they are reported in "errors"
+        info.context.setdefault("errors", []).extend(errors)
 
         # Re-incorporating your grouping logic
         spaces_data = {}
@@ -259,11 +298,14 @@ class Query(ObjectType):
                     )
                     for v in vals
                 ]
+                pending = pending_keys(vals, last_keys)
                 m_groups.append(
                     MeasurementGroup(
                         name=m_type,
                         unit=get_unit_for_measurement_type(m_type),
                         values=ms,
+                        has_more=bool(pending),
+                        cursor=encode_cursor(pending) if pending else None,
                     )
                 )
 
@@ -321,35 +363,105 @@ def build_tree_structure(results, root_name):
     return format_node(nodes_map[root_name]) if root_name in nodes_map else None
 
 
-def get_sensor_measurements_from_dynamo(sensors, start_timestamp, end_timestamp):
-    all_measurements = []
+# Follows LastEvaluatedKey so windows with more than 1 MB of data aren't truncated
+def paginate_sensor_query(
+    sensor_id, start_timestamp, end_timestamp, start_key=None, deadline=None
+):
+    params = {
+        "TableName": "sensor-data",
+        "KeyConditionExpression": "#pk = :sensor_id AND #sk BETWEEN :start AND :end",
+        "ExpressionAttributeNames": {"#pk": "partKey", "#sk": "sortKey"},
+        "ExpressionAttributeValues": {
+            ":sensor_id": {"S": sensor_id},
+            ":start": {"N": str(start_timestamp)},
+            ":end": {"N": str(end_timestamp)},
+        },
+    }
+    for _ in range(DYNAMO_PAGE_BUDGET):
+        if start_key:
+            params["ExclusiveStartKey"] = start_key
+        page = dynamodb.query(**params)
+        yield page
+        if not (start_key := page.get("LastEvaluatedKey")):
+            return
+        if deadline is not None and time.monotonic() >= deadline:
+            # Out of time, the LastEvaluatedKey of this page is the cursor
+            return
+
+
+def decode_measurements(sensor, items):
+    for item in items:
+        measurement = {
+            "spaceName": sensor["spaceName"],
+            "sensor_id": item["partKey"]["S"],
+            "timestamp": item["sortKey"]["N"],
+        }
+        for key, value in item.items():
+            if key not in ["partKey", "sortKey"] and "N" in value:
+                measurement[key] = float(value["N"])
+        yield measurement
+
+
+def query_sensor(sensor, start_timestamp, end_timestamp, start_key=None):
+    deadline = time.monotonic() + DYNAMO_QUERY_TIMEOUT
+    measurements, last_key = [], None
+    for page in paginate_sensor_query(
+        sensor["sensorId"], start_timestamp, end_timestamp, start_key, deadline
+    ):
+        measurements.extend(decode_measurements(sensor, page.get("Items", [])))
+        last_key = page.get("LastEvaluatedKey")
+    # last_key is only set if the page budget or the deadline ran out before
+    # the end of the window
+    return measurements, last_key
+
+
+def get_sensor_measurements_from_dynamo(
+    sensors, start_timestamp, end_timestamp, start_keys=None
+):
+    all_measurements, errors, last_keys = [], [], {}
     if not dynamodb:
-        return all_measurements
-    for sensor in sensors:
-        try:
-            response = dynamodb.query(
-                TableName="sensor-data",
-                KeyConditionExpression="#pk = :sensor_id AND #sk BETWEEN :start AND :end",
-                ExpressionAttributeNames={"#pk": "partKey", "#sk": "sortKey"},
-                ExpressionAttributeValues={
-                    ":sensor_id": {"S": sensor["sensorId"]},
-                    ":start": {"N": str(start_timestamp)},
-                    ":end": {"N": str(end_timestamp)},
-                },
-            )
-            for item in response.get("Items", []):
-                measurement = {
-                    "spaceName": sensor["spaceName"],
-                    "sensor_id": item["partKey"]["S"],
-                    "timestamp": item["sortKey"]["N"],
-                }
-                for key, value in item.items():
-                    if key not in ["partKey", "sortKey"] and "N" in value:
-                        measurement[key] = float(value["N"])
-                all_measurements.append(measurement)
-        except Exception as e:
+        return all_measurements, errors, last_keys
+    start_keys = start_keys or {}
+
+    futures = {
+        dynamo_pool.submit(
+            query_sensor,
+            s,
+            start_timestamp,
+            end_timestamp,
+            start_keys.get(s["sensorId"]),
+        ): s
+        for s in sensors
+    }
+    # Every query stops at its own deadline (see query_sensor), so waiting for
+    # the results is bounded too
+    for future, sensor in futures.items():
+        if e := future.exception():
             print(f"Dynamo Error: {e}")
-    return all_measurements
+            errors.append(f"Error querying sensor {sensor['sensorId']}: {e}")
+        else:
+            measurements, last_key = future.result()
+            all_measurements.extend(measurements)
+            if last_key:
+                last_keys[sensor["sensorId"]] = last_key
+    return all_measurements, errors, last_keys
+
+
+def pending_keys(values, last_keys):
+    # Resume keys of the sensors in this group that still have more data
+    return {
+        sid: last_keys[sid]
+        for sid in {v["sensor_id"] for v in values}
+        if sid in last_keys
+    }
+
+
+def encode_cursor(last_keys):
+    return base64.urlsafe_b64encode(json.dumps(last_keys).encode()).decode()
+
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
 
 
 def iso_to_timestamp(iso_string):
@@ -379,11 +491,13 @@ CORS(app)
 def graphql_server():
     try:
         data = request.get_json()
-        result = schema.execute(data.get("query"), variables=data.get("variables"))
-        if result.errors:
-            return jsonify(
-                {"data": result.data, "errors": [str(e) for e in result.errors]}
-            )
+        context = {"errors": []}
+        result = schema.execute(
+            data.get("query"), variables=data.get("variables"), context_value=context
+        )
+        errors = [str(e) for e in result.errors or []] + context["errors"]
+        if errors:
+            return jsonify({"data": result.data, "errors": errors})
         return jsonify({"data": result.data})
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -3,9 +3,20 @@ import matplotlib.pyplot as plt
 from sklearn.ensemble import HistGradientBoostingRegressor
 from sklearn.metrics import mean_absolute_error
 
+from datapipeline.feature_store import load_params
+
 filename = "datapipeline/2025_export.parquet"
 df = pd.read_parquet(filename)
 
+# The normalization parameters the f_ features were computed with. Predictions
+# on new data must use the same version to be comparable with the training data.
+# Exports from before the feature store don't record a version, their features
+# can still be used for training but the error is only reported normalized.
+version = df.attrs.get("normalization_version")
+params = None
+if version is not None:
+    params = load_params(version, path="datapipeline/feature_store")
+
 print(df.head(10))
 
 # Drop rows where the target is missing (NaN)
@@ -36,6 +47,12 @@ mae = mean_absolute_error(test[target_col], test["prediction"])
 
 print(f"Mean Absolute Error (Normalized): {mae:.4f}")
 
+if params:
+    # Convert the normalized error back to degrees
+    low, high = params["bounds"]["temp_indoor"]
+    print(f"Normalization parameters: version {params['version']}")
+    print(f"Mean Absolute Error: {mae * (high - low):.2f}°C")
+
 subset = test.loc["2025-11-01":"2025-11-07"]
 
 plt.figure(figsize=(10, 5))
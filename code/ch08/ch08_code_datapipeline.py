@@ -68,32 +68,36 @@ def process_dynamodb(df):
         "energyConsumption": "energy",
     }
 
-    room_dfs = []
-
-    # 4. Dynamic Extraction and Resampling
-    for pkey, room_name in mappings.items():
-        # Filter for this specific sensor
-        room_data = df[df["partKey"] == pkey][potential_measurements].copy()
-
-        # Drop columns that are entirely NaN for this specific sensor
-        room_data = room_data.dropna(how="all", axis=1)
-
-        # Ensure we only include numeric data for the mean calculation
-        room_data = room_data.select_dtypes(include=[np.number])
-
-        if not room_data.empty:
-            # Rename columns: {short_name}_{room_name}
-            room_data.columns = [
-                f"{short_names.get(c, c)}_{room_name}" for c in room_data.columns
-            ]
-
-            # Resample to hourly mean
-            room_resampled = room_data.resample("h").mean()
-            room_dfs.append(room_resampled)
-
-    # 5. Combine sensor dataframes
-    df_rooms = pd.concat(room_dfs, axis=1)
-    return df_rooms
+    # 4. Hourly mean of every measurement per sensor in a single groupby
+    df = df[df["partKey"].isin(list(mappings))]
+    rooms = df["partKey"].astype("category").map(mappings).rename("room")
+    measurements = df[potential_measurements].select_dtypes(include=[np.number])
+    hourly = measurements.groupby(
+        [rooms, df.index.floor("h")], observed=True, sort=True
+    ).mean()
+
+    # 5. Pivot to one column per room and measurement: {short_name}_{room_name}
+    df_rooms = hourly.unstack(level=0)
+    # Drop measurements a sensor doesn't have, and order the columns by room
+    df_rooms = df_rooms.dropna(how="all", axis=1)
+    df_rooms = df_rooms[
+        [
+            (c, room_name)
+            for room_name in mappings.values()
+            for c in measurements.columns
+            if (c, room_name) in df_rooms.columns
+        ]
+    ]
+    df_rooms.columns = [
+        f"{short_names.get(c, c)}_{room}" for c, room in df_rooms.columns
+    ]
+
+    # Every sensor covers each hour from its first to its last reading
+    spans = hourly.index.to_frame(index=False).groupby("room", observed=True)
+    hours = pd.DatetimeIndex([], tz=df.index.tz)
+    for start, end in zip(spans["timestamp"].min(), spans["timestamp"].max()):
+        hours = hours.union(pd.date_range(start, end, freq="h"))
+    return df_rooms.reindex(hours.rename("timestamp"))
 
 
 def process_open_meteo(df):
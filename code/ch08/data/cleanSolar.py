@@ -1,44 +1,44 @@
 import pandas as pd
-import numpy as np
-
-
-def process_solar_data(input_file, output_file):
-    # 1. Read the CSV data
-    # We skip the first row (SerialNr) and use ';' as the separator
-    df = pd.read_csv(input_file, sep=";", skiprows=1)
-
-    # 2. Function to clean the scientific notation (e.g. "1800e0" -> 1800.0)
-    def parse_value(val):
-        if isinstance(val, str):
-            try:
-                return float(val)
-            except ValueError:
-                return np.nan  # Return NaN if it's text (like log messages)
-        return val
-
-    # List of columns that contain measurement data to clean
-    # (Excluding Date, Time, IDs, and Description)
-    data_columns = [
-        "Periode [s]",
-        "Energy [Ws]",
-        "Reactive Energy L[Vars]",
-        "Reactive Energy C[Vars]",
-        "Uac L1 [V]",
-        "Uac L2 [V]",
-        "Uac L3 [V]",
-        "Iac L1 [A]",
-        "Iac L2 [A]",
-        "Iac L3 [A]",
-        "Udc MPPT1[V]",
-        "Idc MPPT1[A]",
-        "Udc MPPT2[V]",
-        "Idc MPPT2[A]",
-    ]
 
-    # Apply the cleaning function to these columns
-    for col in data_columns:
-        if col in df.columns:
-            df[col] = df[col].apply(parse_value)
+# Rows read at a time, so exports of several GB don't have to fit in memory
+CHUNK_SIZE = 500_000
+
+# List of columns that contain measurement data to clean
+# (Excluding Date, Time, IDs, and Description)
+DATA_COLUMNS = [
+    "Periode [s]",
+    "Energy [Ws]",
+    "Reactive Energy L[Vars]",
+    "Reactive Energy C[Vars]",
+    "Uac L1 [V]",
+    "Uac L2 [V]",
+    "Uac L3 [V]",
+    "Iac L1 [A]",
+    "Iac L2 [A]",
+    "Iac L3 [A]",
+    "Udc MPPT1[V]",
+    "Idc MPPT1[A]",
+    "Udc MPPT2[V]",
+    "Idc MPPT2[A]",
+]
+
+
+def clean_numeric(df, columns):
+    """Parses the columns as numbers (e.g. "1800e0" -> 1800.0) in place.
+
+    Text (like log messages) becomes NaN, returns the number of such
+    non-numeric cells per column.
+    """
+    raw = df[columns]
+    text = raw.select_dtypes(exclude="number").columns
+    df[text] = raw[text].apply(pd.to_numeric, errors="coerce")
+    return (df[columns].isna() & raw.notna()).sum()
+
+
+def clean_chunk(df, non_numeric):
+    # 2. Clean the scientific notation, counting the cells that aren't numbers
+    data_columns = [c for c in DATA_COLUMNS if c in df.columns]
+    non_numeric.append(clean_numeric(df, data_columns))
 
     # 3. Create Timestamp Columns
     # Combine Date and Time into a proper datetime object
@@ -74,11 +74,27 @@ def process_solar_data(input_file, output_file):
 
     # Select only the columns that exist in our data
     final_columns = [c for c in final_columns if c in df_clean.columns]
-    final_df = df_clean[final_columns]
+    return df_clean[final_columns]
+
+
+def process_solar_data(input_file, output_file, chunk_size=CHUNK_SIZE):
+    # 1. Read the CSV data in chunks
+    # We skip the first row (SerialNr) and use ';' as the separator. The CSV
+    # parser reads "1800e0" as a number, only columns with text are left as
+    # strings to be cleaned.
+    chunks = pd.read_csv(input_file, sep=";", skiprows=1, chunksize=chunk_size)
+    non_numeric = []
+    final_df = pd.concat(clean_chunk(chunk, non_numeric) for chunk in chunks)
 
     # Sort by time
     final_df = final_df.sort_values("Datetime")
 
+    # Report the data quality, e.g. log messages in measurement columns
+    non_numeric = pd.concat(non_numeric, axis=1).sum(axis=1).astype(int)
+    final_df.attrs["non_numeric_counts"] = non_numeric.to_dict()
+    print("Non-numeric cells per column:")
+    print(non_numeric.to_string())
+
     # 6. Save to CSV
     # index=False ensures we don't save the row numbers
     final_df.to_csv(output_file, index=False)
@@ -86,6 +102,7 @@ def process_solar_data(input_file, output_file):
     return final_df
 
 
-# --- Usage ---
-# Replace 'DATA.CSV' with your actual filename if different
-df = process_solar_data("DATA.CSV", "solar_data_clean.csv")
+if __name__ == "__main__":
+    # --- Usage ---
+    # Replace 'DATA.CSV' with your actual filename if different
+    df = process_solar_data("DATA.CSV", "solar_data_clean.csv")
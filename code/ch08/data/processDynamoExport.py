@@ -1,61 +1,127 @@
 import os
-import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# orjson parses the export files several times faster than the json module
+try:
+    import orjson as json
+except ImportError:
+    import json
 
 # 1. Setup: Change this to the path of your directory
 folder_path = "ddb_dump/sensor-data/data"
 
-all_records = []
+# Parquet dataset written with one directory per sensor (partKey=...)
+output_path = "ddb_timeseries"
+
+# Number of export files processed in parallel (None uses every CPU)
+max_workers = None
 
 
-# 2. Helper function to "flatten" DynamoDB JSON
-def extract_value(dynamo_item):
+# 2. Helper function to "flatten" DynamoDB JSON into typed columns
+def extract_columns(items):
+    """
+    Converts [{'humidity': {'N': '0.4'}}, ...] -> {'humidity': array([0.4, ...])}
+
+    Numbers become float64 arrays with NaN where an item doesn't have the
+    attribute, strings become object arrays with None. The attributes are in
+    the order they first appear in, like the columns of pd.DataFrame(items).
     """
-    Converts {'humidity': {'N': '0.4'}} -> {'humidity': 0.4}
+    n = len(items)
+    columns = {}
+    for i, item in enumerate(items):
+        for key, value_dict in item.items():
+            # check if it's a Number
+            if "N" in value_dict:
+                if key not in columns:
+                    columns[key] = np.full(n, np.nan)
+                columns[key][i] = float(value_dict["N"])
+            # check if it's a String
+            elif "S" in value_dict:
+                if key not in columns:
+                    columns[key] = np.full(n, None, dtype=object)
+                columns[key][i] = value_dict["S"]
+            # Add boolean or other types if needed, but your data seems to be N/S
+    return columns
+
+
+def process_file(file_path):
+    """Writes one export file to the Parquet dataset and returns its schema.
+
+    Runs in a worker process, so at most one file per worker is in memory.
     """
-    parsed_item = {}
-    for key, value_dict in dynamo_item.items():
-        # check if it's a Number
-        if "N" in value_dict:
-            parsed_item[key] = float(value_dict["N"])
-        # check if it's a String
-        elif "S" in value_dict:
-            parsed_item[key] = value_dict["S"]
-        # Add boolean or other types if needed, but your data seems to be N/S
-    return parsed_item
-
-
-# 3. Loop through every file in the folder
-print(f"Scanning {folder_path}...")
-
-for filename in os.listdir(folder_path):
-    if filename.endswith(".json"):
-        file_path = os.path.join(folder_path, filename)
-
-        with open(file_path, "r") as f:
-            data = json.load(f)
-
-            # The key in your new format is 'Items', not 'data'
-            if "Items" in data:
-                for item in data["Items"]:
-                    # Extract values and add to our master list
-                    flat_record = extract_value(item)
-                    all_records.append(flat_record)
-
-# 4. Convert to DataFrame
-df = pd.DataFrame(all_records)
-
-if not df.empty:
-    # Convert timestamp
-    df["timestamp"] = pd.to_datetime(df["sortKey"], unit="ms")
-
-    # Optional: Sort by time
-    df = df.sort_values("timestamp")
-
-    # Save to CSV
-    output_file = "merged_dynamodb_data.csv"
-    df.to_csv(output_file, index=False)
-    print(f"Success! Processed {len(df)} records into {output_file}")
-    print(df.head())
-else:
-    print("No data found. Check your folder path and file structure.")
+    with open(file_path, "rb") as f:
+        items = json.loads(f.read()).get("Items", [])
+    if not items:
+        return None
+
+    attributes = extract_columns(items)
+    del items
+
+    # DynamoDB numbers are parsed as float64, except the millisecond sortKey
+    sort_key = attributes.pop("sortKey").astype(np.int64)
+    order = np.argsort(sort_key, kind="stable")
+    columns = {
+        "partKey": pa.array(attributes.pop("partKey")[order]).dictionary_encode(),
+        "sortKey": pa.array(sort_key[order]),
+        "timestamp": pa.array(sort_key[order].astype("datetime64[ms]")),
+    }
+    # Kept in the source order, which is the order of the pipeline's columns
+    columns.update(
+        (k, pa.array(v[order], type=pa.string() if v.dtype == object else None))
+        for k, v in attributes.items()
+    )
+    table = pa.table(columns)
+
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    pq.write_to_dataset(
+        table,
+        output_path,
+        partition_cols=["partKey"],
+        basename_template=f"{stem}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return table.schema
+
+
+def unified_schema(schemas):
+    """Combines the file schemas, since not every file has every attribute."""
+    schema = pa.unify_schemas([s.remove(s.get_field_index("partKey")) for s in schemas])
+    # partKey is stored in the directory names, which are read back as strings
+    return schema.insert(0, pa.field("partKey", pa.string()))
+
+
+def read_timeseries(path=output_path):
+    """Reads the whole dataset back into a DataFrame with a categorical partKey."""
+    df = pd.read_parquet(path, schema=pq.read_schema(f"{path}/_common_metadata"))
+    return df.astype({"partKey": "category"})
+
+
+if __name__ == "__main__":
+    # 3. Process every file in the folder, in parallel
+    print(f"Scanning {folder_path}...")
+    # In the order the files are listed, like the CSV export, so the
+    # attributes of the dataset's schema are in the same order as its columns
+    file_paths = [
+        os.path.join(folder_path, filename)
+        for filename in os.listdir(folder_path)
+        if filename.endswith(".json")
+    ]
+
+    shutil.rmtree(output_path, ignore_errors=True)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        schemas = [s for s in pool.map(process_file, file_paths) if s is not None]
+
+    # 4. Store the schema of the whole dataset, read_timeseries() reads it back
+    if schemas:
+        pq.write_metadata(unified_schema(schemas), f"{output_path}/_common_metadata")
+        dataset = pq.ParquetDataset(output_path)
+        rows = sum(f.count_rows() for f in dataset.fragments)
+        print(f"Success! Processed {rows} records into {output_path}/")
+    else:
+        print("No data found. Check your folder path and file structure.")
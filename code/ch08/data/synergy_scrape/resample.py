@@ -1,62 +1,74 @@
 import os
 import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-import datetime
 
 INPUT_DIR = "electricity_raw"
 OUTPUT_FILE = "hourly_energy_stats.csv"
 
+# Number of processes reading the daily files (None uses every CPU)
+MAX_WORKERS = None
 
-def process_energy_data():
-    all_rows = []
+HALF_HOUR = np.timedelta64(30, "m")
+
+
+def half_hourly_values(values, n):
+    """Converts a list of half-hourly values into n floats, nulls (and missing
+    values at the end) become 0.0."""
+    array = np.zeros(n)
+    values = np.array(values[:n], dtype=float)  # None becomes NaN
+    array[: len(values)] = np.nan_to_num(values, nan=0.0)
+    return array
+
+
+def read_day(path):
+    """Reads one daily JSON file into half-hourly timestamps, consumption and
+    generation arrays, or None if it has no data."""
+    with open(path, "r") as f:
+        try:
+            data = json.load(f)
+            base_date_str = data.get("startDate")
+            consumption_vals = data.get("kwHalfHourlyValues", [])
+            generation_vals = data.get("kwhHalfHourlyValuesGeneration", [])
+
+            if not base_date_str or not consumption_vals:
+                return None
 
+            n = len(consumption_vals)
+            base_date = pd.Timestamp(base_date_str).to_datetime64()
+            return (
+                base_date + HALF_HOUR * np.arange(n),
+                half_hourly_values(consumption_vals, n),
+                half_hourly_values(generation_vals or [], n),
+            )
+
+        except (json.JSONDecodeError, ValueError, TypeError) as e:
+            print(f"Skipping {os.path.basename(path)} due to error: {e}")
+            return None
+
+
+def process_energy_data():
     print(f"Reading files from {INPUT_DIR}...")
-    files = [f for f in os.listdir(INPUT_DIR) if f.endswith(".json")]
-
-    for filename in files:
-        with open(os.path.join(INPUT_DIR, filename), "r") as f:
-            try:
-                data = json.load(f)
-                base_date_str = data.get("startDate")
-                consumption_vals = data.get("kwHalfHourlyValues", [])
-                generation_vals = data.get("kwhHalfHourlyValuesGeneration", [])
-
-                if not base_date_str or not consumption_vals:
-                    continue
-
-                base_date = pd.to_datetime(base_date_str)
-
-                for i in range(len(consumption_vals)):
-                    timestamp = base_date + datetime.timedelta(minutes=30 * i)
-
-                    # Convert nulls to 0.0 and ensure float type
-                    cons = (
-                        consumption_vals[i] if consumption_vals[i] is not None else 0.0
-                    )
-                    gen = (
-                        generation_vals[i]
-                        if (i < len(generation_vals) and generation_vals[i] is not None)
-                        else 0.0
-                    )
-
-                    all_rows.append(
-                        {
-                            "timestamp": timestamp,
-                            "consumption_kw": float(cons),
-                            "generation_kw": float(gen),
-                        }
-                    )
-
-            except (json.JSONDecodeError, ValueError) as e:
-                print(f"Skipping {filename} due to error: {e}")
-
-    if not all_rows:
+    paths = [
+        os.path.join(INPUT_DIR, f) for f in os.listdir(INPUT_DIR) if f.endswith(".json")
+    ]
+
+    # Each file is read in a worker process, the days are concatenated once
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        days = [d for d in pool.map(read_day, paths, chunksize=64) if d is not None]
+
+    if not days:
         print("No valid data found.")
         return
 
-    df = pd.DataFrame(all_rows)
-    df.set_index("timestamp", inplace=True)
-    hourly_df = df.resample("H").mean()
+    timestamps, consumption, generation = map(np.concatenate, zip(*days))
+    df = pd.DataFrame(
+        {"consumption_kw": consumption, "generation_kw": generation},
+        index=pd.DatetimeIndex(timestamps, name="timestamp"),
+    )
+    hourly_df = df.resample("h").mean()
 
     hourly_df.reset_index(inplace=True)
 
@@ -1,9 +1,13 @@
 import requests
 import datetime
+import random
+import threading
 import time
 import os
 import json
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 
 # --- CONFIGURATION ---
 ACCOUNT_ID = "REPLACE WITH_YOUR_ACCOUNT_ID"
@@ -11,6 +15,8 @@ DEVICE_ID = "REPLACE_WITH_YOUR_DEVICE_ID"
 YEAR = 2025
 OUTPUT_DIR = "electricity_raw"
 FINAL_FILE = "home_energy_year_2025.csv"
+# Point this at a local stub server to test the fetcher
+BASE_URL = "https://selfserve.synergy.net.au"
 
 # Replace this with the actual string from your browser
 COOKIE_STRING = "JSESSIONID=..."
@@ -21,49 +27,173 @@ HEADERS = {
     "Cookie": COOKIE_STRING,
 }
 
-if not os.path.exists(OUTPUT_DIR):
-    os.makedirs(OUTPUT_DIR)
-
-
-def fetch_year_data():
-    start_date = datetime.date(YEAR, 1, 1)
-    # If today is in 2025, we stop at yesterday to avoid partial data
-    today = datetime.date.today()
-    end_date = min(datetime.date(YEAR, 12, 31), today - datetime.timedelta(days=1))
-
-    current_date = start_date
-
-    while current_date <= end_date:
-        date_str = current_date.strftime("%Y-%m-%d")
-        next_day_str = (current_date + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
-
-        url = f"https://selfserve.synergy.net.au/apps/rest/intervalData/{ACCOUNT_ID}/getHalfHourlyElecIntervalData"
-        params = {
-            "startDate": date_str,
-            "endDate": next_day_str,
-            "unbilledStartDate": next_day_str,
-            "intervalDeviceIds": DEVICE_ID,
-        }
-
-        print(f"[{date_str}] Requesting data...")
-
+# Be kind to the Synergy portal: a few requests in flight, at most
+# REQUESTS_PER_SECOND on average (with bursts of up to BURST requests)
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 1.0
+BURST = 2
+# Failed requests (connection errors, 429 and 5xx responses) are retried
+# after a random delay of up to BACKOFF_SECONDS * 2^attempt
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1.0
+TIMEOUT_SECONDS = 30
+
+
+class AuthError(Exception):
+    """The cookie has expired, no request will succeed until it's replaced."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket, acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_session(max_workers=MAX_WORKERS):
+    """A session reuses its connections, one per worker."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def day_path(output_dir, day):
+    return os.path.join(output_dir, f"{day:%Y-%m-%d}.json")
+
+
+def fetch_day(
+    session, bucket, day, output_dir=OUTPUT_DIR, base_url=BASE_URL, stop=None
+):
+    """Downloads the half-hourly data of one day, retrying transient failures.
+
+    Returns True if the day was saved. Raises AuthError on a 401 response,
+    after setting stop. The other workers check the stop event before every
+    attempt, and wake from their backoff when it is set.
+    """
+    if stop is None:
+        stop = threading.Event()
+    date_str = day.strftime("%Y-%m-%d")
+    next_day_str = (day + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    url = (
+        f"{base_url}/apps/rest/intervalData/{ACCOUNT_ID}/getHalfHourlyElecIntervalData"
+    )
+    params = {
+        "startDate": date_str,
+        "endDate": next_day_str,
+        "unbilledStartDate": next_day_str,
+        "intervalDeviceIds": DEVICE_ID,
+    }
+
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt:
+            stop.wait(random.uniform(0, BACKOFF_SECONDS * 2**attempt))
+        if stop.is_set():
+            return False
+        bucket.acquire()
         try:
-            response = requests.get(url, headers=HEADERS, params=params)
-
-            if response.status_code == 200:
-                with open(os.path.join(OUTPUT_DIR, f"{date_str}.json"), "w") as f:
-                    json.dump(response.json(), f)
-            elif response.status_code == 401:
-                print("!! Auth Failure: Your Cookie has expired. !!")
-                break
-            else:
-                print(f"!! Error {response.status_code} for {date_str}")
-
-        except Exception as e:
+            response = session.get(url, params=params, timeout=TIMEOUT_SECONDS)
+        except requests.RequestException as e:
             print(f"!! Request failed for {date_str}: {e}")
-
-        current_date += datetime.timedelta(days=1)
-        time.sleep(1)  # Be kind to the Synergy portal
+            continue
+
+        if response.status_code == 200:
+            try:
+                data = response.json()
+            except ValueError:
+                # E.g. a login page instead of the data
+                print(f"!! Response for {date_str} is not JSON")
+                return False
+            path = day_path(output_dir, day)
+            # Written to a temporary file first, so a resumed run never
+            # mistakes a partially written day for a complete one
+            try:
+                with open(f"{path}.tmp", "w") as f:
+                    json.dump(data, f)
+                os.replace(f"{path}.tmp", path)
+            except OSError as e:
+                print(f"!! Could not save {date_str}: {e}")
+                if os.path.exists(f"{path}.tmp"):
+                    os.remove(f"{path}.tmp")
+                return False
+            print(f"[{date_str}] Saved.")
+            return True
+        elif response.status_code == 401:
+            stop.set()
+            raise AuthError("!! Auth Failure: Your Cookie has expired. !!")
+        elif response.status_code == 429 or response.status_code >= 500:
+            print(f"!! Error {response.status_code} for {date_str}, retrying")
+        else:
+            print(f"!! Error {response.status_code} for {date_str}")
+            return False
+
+    print(f"!! Giving up on {date_str} after {MAX_RETRIES + 1} attempts")
+    return False
+
+
+def fetch_year_data(
+    year=YEAR,
+    output_dir=OUTPUT_DIR,
+    base_url=BASE_URL,
+    max_workers=MAX_WORKERS,
+    rate=REQUESTS_PER_SECOND,
+):
+    """Downloads every day of the year that isn't on disk yet.
+
+    Days already in output_dir are skipped, so an interrupted run can simply
+    be started again. Returns the number of days saved.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    start_date = datetime.date(year, 1, 1)
+    # If today is in the year, we stop at yesterday to avoid partial data
+    today = datetime.date.today()
+    end_date = min(datetime.date(year, 12, 31), today - datetime.timedelta(days=1))
+
+    days = [
+        start_date + datetime.timedelta(days=i)
+        for i in range((end_date - start_date).days + 1)
+    ]
+    missing = [day for day in days if not os.path.exists(day_path(output_dir, day))]
+    print(f"{len(days) - len(missing)} days on disk, requesting {len(missing)} days...")
+
+    bucket = TokenBucket(rate, BURST)
+    # Set on an auth failure, so the other workers stop instead of retrying
+    stop = threading.Event()
+    saved = 0
+    with make_session(max_workers) as session, ThreadPoolExecutor(max_workers) as pool:
+        futures = [
+            pool.submit(fetch_day, session, bucket, day, output_dir, base_url, stop)
+            for day in missing
+        ]
+        try:
+            for future in as_completed(futures):
+                saved += future.result()
+        except AuthError as e:
+            print(e)
+            for future in futures:
+                future.cancel()
+    print(f"Saved {saved} of {len(missing)} days.")
+    return saved
 
 
 def compile_to_csv():
@@ -0,0 +1,115 @@
+"""
+Tests of scrape.py against a local stub of the Synergy portal. Run them with:
+python -m pytest test_scrape.py
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import scrape
+
+YEAR = 2024
+# The days the tests leave to download, every other day is already on disk
+MISSING = [datetime.date(YEAR, 3, d) for d in range(1, 7)]
+
+
+class StubPortal(ThreadingHTTPServer):
+    """Answers each day with the status and body in responses (200 and JSON
+    by default) and records when each request arrived."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.responses = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        day = parse_qs(urlparse(self.path).query)["startDate"][0]
+        with self.server.lock:
+            self.server.requests.append((time.monotonic(), day))
+        status, body = self.server.responses.get(
+            day, (200, json.dumps({"intervalData": [{"day": day}]}))
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def portal():
+    server = StubPortal()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    day = datetime.date(YEAR, 1, 1)
+    while day.year == YEAR:
+        if day not in MISSING:
+            with open(scrape.day_path(tmp_path, day), "w") as f:
+                json.dump({"intervalData": []}, f)
+        day += datetime.timedelta(days=1)
+    return tmp_path
+
+
+def test_only_missing_days_are_fetched_within_the_rate_limit(portal, output_dir):
+    rate = 20.0
+
+    saved = scrape.fetch_year_data(YEAR, output_dir, portal.url, rate=rate)
+
+    assert saved == len(MISSING)
+    assert sorted(day for _, day in portal.requests) == [f"{d}" for d in MISSING]
+    # A burst of BURST requests, then one request per 1 / rate seconds
+    times = sorted(t for t, _ in portal.requests)
+    assert times[-1] - times[0] >= 0.9 * (len(MISSING) - scrape.BURST) / rate
+
+
+def test_days_are_saved_whole_or_not_at_all(portal, output_dir):
+    portal.responses[f"{MISSING[0]}"] = (200, "<html>Please log in</html>")
+
+    saved = scrape.fetch_year_data(YEAR, output_dir, portal.url, rate=100)
+
+    assert saved == len(MISSING) - 1
+    assert not os.path.exists(scrape.day_path(output_dir, MISSING[0]))
+    for day in MISSING[1:]:
+        with open(scrape.day_path(output_dir, day)) as f:
+            assert json.load(f) == {"intervalData": [{"day": f"{day}"}]}
+    assert not [name for name in os.listdir(output_dir) if name.endswith(".tmp")]
+
+
+def test_auth_failure_stops_the_workers_that_are_retrying(
+    portal, output_dir, monkeypatch
+):
+    # Without the stop, the other days would retry for up to a minute
+    monkeypatch.setattr(scrape, "BACKOFF_SECONDS", 1.0)
+    for day in MISSING:
+        portal.responses[f"{day}"] = (503, "Service Unavailable")
+    portal.responses[f"{MISSING[0]}"] = (401, "Unauthorized")
+
+    start = time.monotonic()
+    saved = scrape.fetch_year_data(YEAR, output_dir, portal.url, rate=100)
+
+    assert saved == 0
+    assert time.monotonic() - start < 3
+    assert len(portal.requests) < 2 * len(MISSING)
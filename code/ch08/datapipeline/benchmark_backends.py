@@ -0,0 +1,184 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import pipeline
+import pipeline_polars
+
+# Synthetic dataset: readings every 5 minutes from the four mapped sensors
+# and a number of sensors the pipeline filters out, plus the CSV sources
+N_YEARS = int(os.environ.get("N_YEARS", "3"))
+N_UNMAPPED_SENSORS = int(os.environ.get("N_UNMAPPED_SENSORS", "12"))
+READING_INTERVAL = "5min"
+REPEATS = 3
+
+SENSOR_ATTRIBUTES = {
+    "outdoor": ["temperature", "humidity"],
+    "indoor": ["temperature", "humidity"],
+    "living_room": [
+        "temperature",
+        "humidity",
+        "co2",
+        "tvoc",
+        "pm25",
+        "pm10",
+        "presssure",
+        "pir",
+    ],
+    "fridge": ["energyConsumption", "power", "current", "voltage"],
+}
+
+
+def sensor_table(part_key, attributes, times, rng):
+    n = len(times)
+    sort_key = times.asi8 // 10**6
+    columns = {
+        "partKey": pa.array(np.full(n, part_key)).dictionary_encode(),
+        "sortKey": pa.array(sort_key),
+        "timestamp": pa.array(sort_key.astype("datetime64[ms]")),
+    }
+    daily = np.sin(2 * np.pi * (times.hour.to_numpy() - 8) / 24)
+    for attribute in attributes:
+        if attribute == "pir":
+            pir = np.where(rng.random(n) < 0.2, "trigger", "idle")
+            columns[attribute] = pa.array(pir, type=pa.string())
+        elif attribute == "temperature":
+            values = 20 + 6 * daily + rng.normal(0, 0.5, n)
+            columns[attribute] = pa.array(np.round(values, 2))
+        else:
+            columns[attribute] = pa.array(np.round(rng.gamma(2.0, 10.0, n), 1))
+    return pa.table(columns)
+
+
+def write_dataset(path, start, end, rng):
+    """Writes the DynamoDB readings like processDynamoExport.py does."""
+    times = pd.date_range(start, end, freq=READING_INTERVAL, tz="UTC")
+    sensors = [
+        (part_key, SENSOR_ATTRIBUTES[room])
+        for part_key, room in pipeline.SENSOR_MAPPINGS.items()
+    ]
+    sensors += [
+        (f"unmapped{i:04d}", ["temperature", "humidity"])
+        for i in range(N_UNMAPPED_SENSORS)
+    ]
+    schemas = []
+    for part_key, attributes in sensors:
+        table = sensor_table(part_key, attributes, times, rng)
+        pq.write_to_dataset(table, path, partition_cols=["partKey"])
+        schemas.append(table.schema.remove(0))
+    schema = pa.unify_schemas(schemas).insert(0, pa.field("partKey", pa.string()))
+    pq.write_metadata(schema, os.path.join(path, "_common_metadata"))
+    return len(times) * len(sensors)
+
+
+def write_csv_sources(directory, start, end, rng):
+    """Writes the Open-Meteo, solar, Powerpal and Synergy CSV files."""
+    files = {}
+    hours = pd.date_range(start, end, freq="h")
+    files["meteo"] = os.path.join(directory, "open_meteo.csv")
+    pd.DataFrame(
+        {
+            "time": hours.strftime("%Y-%m-%dT%H:%M"),
+            "cloud_cover (%)": rng.integers(0, 101, len(hours)),
+            "temperature_2m (°C)": np.round(rng.normal(22, 5, len(hours)), 1),
+            "relative_humidity_2m (%)": rng.integers(20, 100, len(hours)),
+            "rain (mm)": np.round(rng.exponential(0.1, len(hours)), 2),
+            "direct_radiation_instant (W/m²)": np.round(
+                rng.uniform(0, 900, len(hours)), 1
+            ),
+        }
+    ).to_csv(files["meteo"], index=False)
+
+    minutes = pd.date_range(start, end, freq=READING_INTERVAL)
+    files["solar"] = os.path.join(directory, "solar.csv")
+    pd.DataFrame(
+        {
+            "Datetime": minutes.strftime("%Y-%m-%d %H:%M:%S"),
+            "Energy [kWh]": np.round(rng.uniform(0, 0.5, len(minutes)), 3),
+            "Power [W]": np.round(rng.uniform(0, 5000, len(minutes)), 1),
+        }
+    ).to_csv(files["solar"], index=False)
+
+    files["powerpal"] = os.path.join(directory, "powerpal.csv")
+    pd.DataFrame(
+        {
+            "datetime_local": minutes.strftime("%Y-%m-%d %H:%M:%S"),
+            "watt_hours": rng.integers(0, 200, len(minutes)),
+        }
+    ).to_csv(files["powerpal"], index=False)
+
+    files["synergy"] = os.path.join(directory, "synergy.csv")
+    pd.DataFrame(
+        {
+            "timestamp": hours.strftime("%Y-%m-%d %H:%M:%S"),
+            "consumption_kWh": rng.uniform(0, 3, len(hours)),
+            "generation_kWh": rng.uniform(0, 4, len(hours)),
+        }
+    ).to_csv(files["synergy"], index=False)
+    return files
+
+
+def best_time(fn):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def check_same(expected, actual):
+    """Compares the pandas and Polars outputs, NaN and null are both missing."""
+    actual = actual.set_index("timestamp")
+    assert list(actual.columns) == list(expected.columns)
+    assert (actual.index == expected.index).all()
+    # datetime_perth and epoch are formatted from the index compared above
+    for column in expected.columns.drop(["datetime_perth", "epoch"]):
+        assert np.allclose(
+            expected[column].astype(float),
+            actual[column].astype(float),
+            equal_nan=True,
+        ), column
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(42)
+    end = pd.Timestamp("2025-12-31 23:00")
+    start = end - pd.DateOffset(years=N_YEARS)
+    directory = tempfile.mkdtemp(prefix="pipeline_benchmark_")
+    try:
+        dynamo = os.path.join(directory, "ddb_timeseries")
+        readings = write_dataset(dynamo, start, end, rng)
+        files = write_csv_sources(directory, start, end, rng)
+        files["dynamo"] = dynamo
+        print(
+            f"{N_YEARS} years, {len(pipeline.SENSOR_MAPPINGS) + N_UNMAPPED_SENSORS} "
+            f"sensors, {readings} DynamoDB readings"
+        )
+
+        # Keeps the feature store and the source cache of the real data as they are
+        store = os.path.join(directory, "feature_store")
+        cache = os.path.join(directory, "source_cache")
+        pandas_time, expected = best_time(
+            lambda: pipeline.run_pipeline(files, store_path=store, cache_path=cache)
+        )
+        plan = pipeline_polars.build_pipeline(files)
+        polars_time, actual = best_time(lambda: plan.collect().to_pandas())
+        check_same(expected, actual)
+        output = os.path.join(directory, "export.parquet")
+        sink_time, _ = best_time(lambda: plan.sink_parquet(output))
+
+        print(f"pandas:                 {pandas_time:.2f} s")
+        print(
+            f"Polars (collect):       {polars_time:.2f} s "
+            f"({pandas_time / polars_time:.1f}x faster)"
+        )
+        print(f"Polars (sink_parquet):  {sink_time:.2f} s")
+    finally:
+        shutil.rmtree(directory)
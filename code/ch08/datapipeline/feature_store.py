@@ -0,0 +1,99 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Min-max normalized features and the columns they are computed from
+NORMALIZED_FEATURES = {
+    "f_temp_indoor": "temp_indoor",
+    "f_temp_outdoor": "temp_outdoor",
+    # 'pv_power' comes from process_solar_pv (originally 'Power [W]')
+    "f_solar_norm": "pv_power",
+    "f_grid_import_norm": "synergy_consumption",
+    "f_grid_export_norm": "synergy_production",
+}
+
+# Fitted normalization parameters are stored here, one JSON file per version
+STORE_PATH = "feature_store"
+
+
+def min_max_normalize(series, bounds=None):
+    """Min-Max Normalize, with the series' own min and max unless bounds are given."""
+    low, high = bounds if bounds else (series.min(), series.max())
+    if high == low:
+        return 0
+    return (series - low) / (high - low)
+
+
+def normalization_bounds(df, bounds=None):
+    """Min and max of every normalized column, widened to include earlier bounds.
+
+    Fitting chunk by chunk gives the same bounds as fitting all the data at once.
+    """
+    bounds = dict(bounds or {})
+    for column in NORMALIZED_FEATURES.values():
+        if column in df.columns:
+            low, high = bounds.get(column, (np.nan, np.nan))
+            bounds[column] = [
+                float(np.fmin(low, df[column].min())),
+                float(np.fmax(high, df[column].max())),
+            ]
+    return bounds
+
+
+def list_versions(path=STORE_PATH):
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        int(name[1:-5])
+        for name in os.listdir(path)
+        if name.startswith("v") and name.endswith(".json")
+    )
+
+
+def load_params(version=None, path=STORE_PATH):
+    """Loads a version of the normalization parameters, the latest by default.
+
+    Returns None if nothing has been fitted yet. Raises FileNotFoundError if
+    the requested version isn't in the store.
+    """
+    if version is None:
+        versions = list_versions(path)
+        if not versions:
+            return None
+        version = versions[-1]
+    file_path = os.path.join(path, f"v{version}.json")
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(
+            f"Normalization parameters version {version} not found in {path} "
+            f"(available: {list_versions(path) or 'none'})"
+        )
+    with open(file_path) as f:
+        return json.load(f)
+
+
+def same_bounds(bounds, other):
+    """Whether both have the same columns and equal bounds, up to the rounding
+    differences between the pandas and Polars pipelines."""
+    return bounds.keys() == other.keys() and all(
+        np.allclose(bounds[c], other[c], rtol=1e-9, atol=0, equal_nan=True)
+        for c in bounds
+    )
+
+
+def save_params(bounds, path=STORE_PATH):
+    """Saves bounds as a new version, unless they equal the latest version."""
+    latest = load_params(path=path)
+    if latest and same_bounds(latest["bounds"], bounds):
+        return latest
+    params = {
+        "version": latest["version"] + 1 if latest else 1,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "method": "min_max",
+        "bounds": bounds,
+    }
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, f"v{params['version']}.json"), "w") as f:
+        json.dump(params, f, indent=2)
+    return params
@@ -1,5 +1,22 @@
+import argparse
+import json
+import os
+
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from feature_store import (
+    NORMALIZED_FEATURES,
+    STORE_PATH,
+    load_params,
+    min_max_normalize,
+    normalization_bounds,
+    save_params,
+)
+from source_cache import CACHE_PATH, read_source
 
 
 def process_synergy(df):
@@ -26,6 +43,23 @@ def process_synergy(df):
     return df
 
 
+# Define sensor mapping (TODO: pull this from our Knowledge Graph dynamically)
+SENSOR_MAPPINGS = {
+    "a840411971871c86": "outdoor",
+    "24e124710b423527": "living_room",
+    "a84041ce41845d13": "indoor",
+    "24e124148e423058": "fridge",
+}
+
+# Map for cleaner column naming
+SHORT_NAMES = {
+    "temperature": "temp",
+    "humidity": "hum",
+    "presssure": "pres",  # Handling the typo 'presssure' in the source data
+    "energyConsumption": "energy",
+}
+
+
 def process_dynamodb(df):
 
     # Remove entries where temperature is 23.05 and humidity is 0.4
@@ -47,52 +81,43 @@ def process_dynamodb(df):
         # Convert strings to numeric activity level (1=motion, 0=idle)
         df["pir"] = df["pir"].map({"trigger": 1, "idle": 0})
 
-    # 3. Define sensor mapping (TODO: pull this from our Knowledge Graph dynamically)
-    mappings = {
-        "a840411971871c86": "outdoor",
-        "24e124710b423527": "living_room",
-        "a84041ce41845d13": "indoor",
-        "24e124148e423058": "fridge",
-    }
+    # 3. Sensor mapping and cleaner column names (defined above)
+    mappings, short_names = SENSOR_MAPPINGS, SHORT_NAMES
 
     # Measurement columns to consider (excluding ID/Time keys)
     exclude_cols = ["sortKey", "partKey", "timestamp"]
     potential_measurements = [c for c in df.columns if c not in exclude_cols]
 
-    # Map for cleaner column naming
-    short_names = {
-        "temperature": "temp",
-        "humidity": "hum",
-        "presssure": "pres",  # Handling the typo 'presssure' in the source data
-        "energyConsumption": "energy",
-    }
-
-    room_dfs = []
-
-    # 4. Dynamic Extraction and Resampling
-    for pkey, room_name in mappings.items():
-        # Filter for this specific sensor
-        room_data = df[df["partKey"] == pkey][potential_measurements].copy()
-
-        # Drop columns that are entirely NaN for this specific sensor
-        room_data = room_data.dropna(how="all", axis=1)
-
-        # Ensure we only include numeric data for the mean calculation
-        room_data = room_data.select_dtypes(include=[np.number])
-
-        if not room_data.empty:
-            # Rename columns: {short_name}_{room_name}
-            room_data.columns = [
-                f"{short_names.get(c, c)}_{room_name}" for c in room_data.columns
-            ]
-
-            # Resample to hourly mean
-            room_resampled = room_data.resample("h").mean()
-            room_dfs.append(room_resampled)
-
-    # 5. Combine sensor dataframes
-    df_rooms = pd.concat(room_dfs, axis=1)
-    return df_rooms
+    # 4. Hourly mean of every measurement per sensor in a single groupby
+    df = df[df["partKey"].isin(list(mappings))]
+    rooms = df["partKey"].astype("category").map(mappings).rename("room")
+    measurements = df[potential_measurements].select_dtypes(include=[np.number])
+    hourly = measurements.groupby(
+        [rooms, df.index.floor("h")], observed=True, sort=True
+    ).mean()
+
+    # 5. Pivot to one column per room and measurement: {short_name}_{room_name}
+    df_rooms = hourly.unstack(level=0)
+    # Drop measurements a sensor doesn't have, and order the columns by room
+    df_rooms = df_rooms.dropna(how="all", axis=1)
+    df_rooms = df_rooms[
+        [
+            (c, room_name)
+            for room_name in mappings.values()
+            for c in measurements.columns
+            if (c, room_name) in df_rooms.columns
+        ]
+    ]
+    df_rooms.columns = [
+        f"{short_names.get(c, c)}_{room}" for c, room in df_rooms.columns
+    ]
+
+    # Every sensor covers each hour from its first to its last reading
+    spans = hourly.index.to_frame(index=False).groupby("room", observed=True)
+    hours = pd.DatetimeIndex([], tz=df.index.tz)
+    for start, end in zip(spans["timestamp"].min(), spans["timestamp"].max()):
+        hours = hours.union(pd.date_range(start, end, freq="h"))
+    return df_rooms.reindex(hours.rename("timestamp"))
 
 
 def process_open_meteo(df):
@@ -127,35 +152,23 @@ def process_powerpal(df):
     return df.resample("h").agg({"pp_energy": "sum"})
 
 
-def add_ml_features(df):
+def add_ml_features(df, bounds=None):
     """
     Computes normalized, temporal, and lagged features with prefix 'f_'.
+
+    bounds ({column: [min, max]}, see feature_store.py) normalizes with stored
+    bounds rather than the min and max of df, so a slice of the data gets the
+    same features.
     """
     df = df.copy()
 
-    # Helper: Min-Max Normalize
-    def min_max_normalize(series):
-        if series.max() == series.min():
-            return 0
-        return (series - series.min()) / (series.max() - series.min())
-
     # A. Normalization (Creating f_ columns, preserving originals)
     # -----------------------------------------------------------
-    if "temp_indoor" in df.columns:
-        df["f_temp_indoor"] = min_max_normalize(df["temp_indoor"])
-
-    if "temp_outdoor" in df.columns:
-        df["f_temp_outdoor"] = min_max_normalize(df["temp_outdoor"])
-
-    # 'pv_power' comes from process_solar_pv (originally 'Power [W]')
-    if "pv_power" in df.columns:
-        df["f_solar_norm"] = min_max_normalize(df["pv_power"])
-
-    if "synergy_consumption" in df.columns:
-        df["f_grid_import_norm"] = min_max_normalize(df["synergy_consumption"])
-
-    if "synergy_production" in df.columns:
-        df["f_grid_export_norm"] = min_max_normalize(df["synergy_production"])
+    for feature, column in NORMALIZED_FEATURES.items():
+        if column in df.columns:
+            df[feature] = min_max_normalize(
+                df[column], bounds.get(column) if bounds else None
+            )
 
     # B. Temporal Features: Cyclical Encoding
     # -----------------------------------------------------------
@@ -180,28 +193,63 @@ def add_ml_features(df):
     return df
 
 
-def run_pipeline(files):
-    # Load and process DynamoDB with all attributes
-    df_rooms = process_dynamodb(pd.read_csv(files["dynamo"], low_memory=False))
-
-    # Process other sources (using try/except in case files are missing during testing)
-    others = []
-    for key, func in [
-        ("meteo", process_open_meteo),
-        ("solar", process_solar_pv),
-        ("powerpal", process_powerpal),
-        ("synergy", process_synergy),
-    ]:
-        try:
-            others.append(func(pd.read_csv(files[key])))
-        except FileNotFoundError:
-            continue
-
-    # Final Alignment
-    merged = pd.concat([df_rooms] + others, axis=1).sort_index()
+def read_dynamodb(path, since=None, cache_path=CACHE_PATH):
+    """Reads a CSV export, or the Parquet dataset written by processDynamoExport.py.
 
+    since (a timestamp) only reads the readings from that time on.
+    """
+    if not os.path.isdir(path):
+        df = read_source("dynamo", path, cache_path)
+        if since is not None:
+            df = df[df["sortKey"] >= since.timestamp() * 1000]
+        return df
+    # Not every file of the dataset has every attribute, _common_metadata has them all
+    schema = pq.read_schema(os.path.join(path, "_common_metadata"))
+    filters = None if since is None else [("sortKey", ">=", since.timestamp() * 1000)]
+    df = pd.read_parquet(path, schema=schema, filters=filters)
+    return df.astype({"partKey": "category"})
+
+
+# Sources in merge order, the time column of each CSV is in Perth time
+SOURCES = [
+    ("dynamo", process_dynamodb, "sortKey"),
+    ("meteo", process_open_meteo, "time"),
+    ("solar", process_solar_pv, "Datetime"),
+    ("powerpal", process_powerpal, "datetime_local"),
+    ("synergy", process_synergy, "timestamp"),
+]
+
+
+def load_sources(files, watermarks=None, cache_path=CACHE_PATH):
+    """Processes every source into hourly data, keyed by source.
+
+    watermarks ({source: last hour processed}) only processes the readings from
+    that hour on. The last hour is processed again, as it may have been incomplete.
+    """
+    watermarks = watermarks or {}
+    frames = {}
+    for key, func, time_column in SOURCES:
+        since = watermarks.get(key)
+        if key == "dynamo":
+            # Load and process DynamoDB with all attributes
+            df = read_dynamodb(files[key], since, cache_path)
+        else:
+            # Process other sources (using try/except in case files are missing during testing)
+            try:
+                df = read_source(key, files[key], cache_path)
+            except FileNotFoundError:
+                continue
+            if since is not None:
+                times = pd.to_datetime(df[time_column])
+                df = df[times >= since.tz_localize(None)]
+        if not df.empty:
+            frames[key] = func(df)
+    return frames
+
+
+def finish_features(merged, bounds=None):
     print("Generating ML features (f_ prefix)...")
-    merged = add_ml_features(merged)
+    merged = add_ml_features(merged, bounds)
 
     # Final Formatting for Perth/Singapore alignment
     merged["datetime_perth"] = merged.index.strftime("%Y-%m-%d %H:00:00")
@@ -210,9 +258,138 @@ def run_pipeline(files):
     return merged
 
 
+def run_pipeline(files, store_path=STORE_PATH, cache_path=CACHE_PATH):
+    frames = load_sources(files, cache_path=cache_path)
+
+    # Final Alignment
+    merged = pd.concat(list(frames.values()), axis=1).sort_index()
+
+    # Store the normalization parameters, so that predictions on new data
+    # can use the same transforms as the training data
+    params = save_params(normalization_bounds(merged), store_path)
+    merged = finish_features(merged, params["bounds"])
+    merged.attrs["normalization_version"] = params["version"]
+    return merged
+
+
+# Incremental runs: the output is a Parquet dataset partitioned by month, and
+# the state file keeps the last hour processed per source (the watermarks)
+# and the version of the normalization parameters the dataset was built with
+DATASET_PATH = "export_dataset"
+STATE_PATH = "pipeline_state.json"
+# Rows before the new data needed to compute the lagged features
+LAG_CONTEXT_ROWS = 3
+
+
+def read_dataset(path, from_month=None):
+    """Reads the monthly dataset (from a "YYYY-MM" month on) into a DataFrame."""
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    # Months can have different columns, e.g. when a sensor was added
+    schema = pa.unify_schemas([f.physical_schema for f in dataset.get_fragments()])
+    schema = schema.append(pa.field("month", pa.string()))
+    dataset = ds.dataset(path, schema=schema, format="parquet", partitioning="hive")
+    filter = None if from_month is None else ds.field("month") >= from_month
+    df = dataset.to_table(filter=filter).to_pandas()
+    return df.drop(columns="month").set_index("timestamp").sort_index()
+
+
+def write_months(df, path):
+    """Writes df to the monthly dataset, replacing the months it has rows for."""
+    df = df.rename_axis("timestamp").reset_index()
+    df["month"] = df["timestamp"].dt.strftime("%Y-%m")
+    df.to_parquet(
+        path,
+        partition_cols=["month"],
+        index=False,
+        existing_data_behavior="delete_matching",
+    )
+
+
+def save_state(path, frames, params, watermarks=None):
+    watermarks = dict(watermarks or {})
+    watermarks.update((key, frame.index.max()) for key, frame in frames.items())
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "watermarks": {k: v.isoformat() for k, v in watermarks.items()},
+                "normalization_version": params["version"],
+            },
+            f,
+            indent=2,
+        )
+
+
+def run_incremental(
+    files, dataset_path=DATASET_PATH, state_path=STATE_PATH, store_path=STORE_PATH
+):
+    """Processes only the hours after each source's watermark into the dataset.
+
+    The first run processes everything. Later runs recompute the features of
+    the new hours only, unless the new data is outside the normalization bounds
+    stored so far, which changes every normalized value and rewrites all months.
+    """
+    if not os.path.exists(state_path) or not os.path.isdir(dataset_path):
+        frames = load_sources(files)
+        merged = pd.concat(list(frames.values()), axis=1).sort_index()
+        params = save_params(normalization_bounds(merged), store_path)
+        merged = finish_features(merged, params["bounds"])
+        write_months(merged, dataset_path)
+        save_state(state_path, frames, params)
+        return merged
+
+    with open(state_path) as f:
+        state = json.load(f)
+    watermarks = {k: pd.Timestamp(v) for k, v in state["watermarks"].items()}
+    frames = load_sources(files, watermarks)
+    if not frames:
+        print("No new data since the last run.")
+        return pd.DataFrame()
+
+    # The earliest hour any source has new data for starts the affected tail
+    tail_start = min(frame.index.min() for frame in frames.values())
+    new = pd.concat(list(frames.values()), axis=1).sort_index()
+    params = load_params(state["normalization_version"], store_path)
+    bounds = normalization_bounds(new, params["bounds"])
+    if bounds == params["bounds"]:
+        # Read the month before too, for the rows the lagged features need
+        from_month = (tail_start - pd.DateOffset(months=1)).strftime("%Y-%m")
+    else:
+        print("Normalization bounds changed, recomputing all months...")
+        params = save_params(bounds, store_path)
+        from_month = None
+    existing = read_dataset(dataset_path, from_month)
+    raw_columns = [
+        c
+        for c in existing.columns
+        if not c.startswith("f_") and c not in ("datetime_perth", "epoch")
+    ]
+    if from_month is None:
+        start = existing.index.min()
+    else:
+        context = existing.index[existing.index < tail_start][-LAG_CONTEXT_ROWS:]
+        start = context[0] if len(context) else tail_start
+    window = existing.loc[start:, raw_columns]
+
+    # New values replace the stored ones, other sources keep theirs
+    window = new.combine_first(window)[
+        raw_columns + [c for c in new.columns if c not in raw_columns]
+    ]
+    updated = finish_features(window, params["bounds"])
+
+    # Rewrite the affected months: stored rows before the tail, updated rows after
+    write_from = tail_start if from_month else start
+    kept = existing[existing.index < write_from]
+    kept = kept[kept.index.strftime("%Y-%m") >= write_from.strftime("%Y-%m")]
+    months = pd.concat([kept, updated.loc[write_from:]])
+    write_months(months, dataset_path)
+    save_state(state_path, frames, params, watermarks)
+    print(f"Processed {len(updated.loc[write_from:])} hours from {write_from}.")
+    return updated.loc[write_from:]
+
+
 # Configuration
 files = {
-    "dynamo": "../data/ddb_timeseries.csv",
+    "dynamo": "../data/ddb_timeseries",
     "meteo": "../data/open_meteo.csv",
     "solar": "../data/solorpv.csv",
     "powerpal": "../data/powerpal.csv",
@@ -220,6 +397,16 @@ files = {
 }
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"only process new hours into the monthly dataset in {DATASET_PATH}",
+    )
+    if parser.parse_args().incremental:
+        run_incremental(files)
+        raise SystemExit
+
     final_df = run_pipeline(files)
 
     final_df = final_df.loc["2025-01-01":"2025-12-08"]
@@ -230,6 +417,9 @@ if __name__ == "__main__":
     final_df.to_parquet("2025_export.parquet")
 
     print(f"Extraction complete for 2025. Rows exported: {len(final_df)}")
+    print(
+        f"Normalization parameters: version {final_df.attrs['normalization_version']}"
+    )
     print("New columns include:")
     # Print only living room and fridge columns to verify
     print([c for c in final_df.columns if "living_room" in c or "fridge" in c])
@@ -0,0 +1,288 @@
+import json
+import os
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+
+from feature_store import NORMALIZED_FEATURES, STORE_PATH, save_params
+from pipeline import SENSOR_MAPPINGS, SHORT_NAMES, files
+
+# The same stages as pipeline.py, expressed as one lazy Polars query plan.
+# Polars pushes the sensor filter and the columns each stage uses down into
+# the CSV and Parquet scans, runs the plan on every core, and can stream the
+# result to Parquet without building each source in memory first.
+
+TZ = "Australia/Perth"
+
+
+def hourly(lf, time_column, aggs):
+    """Resamples to hourly, with a row for every hour from the first to the last
+    (like pandas' resample), aggs are the aggregations of each column."""
+    lf = lf.with_columns(pl.col(time_column).dt.truncate("1h"))
+    hours = lf.select(
+        pl.datetime_range(
+            pl.col(time_column).min(), pl.col(time_column).max(), "1h"
+        ).alias("timestamp")
+    )
+    grouped = lf.group_by(pl.col(time_column).alias("timestamp")).agg(aggs)
+    return hours.join(grouped, on="timestamp", how="left")
+
+
+def scan_dynamodb(path):
+    """Scans a CSV export, or the Parquet dataset written by processDynamoExport.py."""
+    if not os.path.isdir(path):
+        # Sparse attributes are empty for long stretches, so infer from every row
+        return pl.scan_csv(
+            path,
+            infer_schema_length=None,
+            schema_overrides={"partKey": pl.String, "pir": pl.String},
+        )
+    # Not every file of the dataset has every attribute, _common_metadata has them all
+    schema = pl.from_arrow(
+        pq.read_schema(os.path.join(path, "_common_metadata")).empty_table()
+    ).schema
+    schema.pop("partKey", None)
+    return pl.scan_parquet(
+        os.path.join(path, "**", "*.parquet"),
+        schema=schema,
+        hive_partitioning=True,
+        hive_schema={"partKey": pl.String},
+        missing_columns="insert",
+    ).with_columns(
+        # Missing attributes are stored as NaN, Polars aggregations skip nulls
+        pl.col(pl.Float64).fill_nan(None)
+    )
+
+
+def process_dynamodb(lf):
+    """Process DynamoDB: Pivoting partKeys and extracting all available measurements."""
+    names = lf.collect_schema().names()
+    lf = lf.filter(pl.col("partKey").is_in(list(SENSOR_MAPPINGS)))
+
+    # Remove entries where temperature is 23.05 and humidity is 0.4
+    if "temperature" in names and "humidity" in names:
+        anomaly = (pl.col("temperature") == 23.05) & (pl.col("humidity") == 0.4)
+        lf = lf.filter(~anomaly.fill_null(False))
+
+    # Convert PIR strings to numeric activity level (1=motion, 0=idle)
+    if "pir" in names:
+        lf = lf.with_columns(
+            pl.col("pir").replace_strict(
+                {"trigger": 1.0, "idle": 0.0}, default=None, return_dtype=pl.Float64
+            )
+        )
+    lf = lf.with_columns(
+        pl.from_epoch("sortKey", time_unit="ms")
+        .dt.replace_time_zone("UTC")
+        .dt.convert_time_zone(TZ)
+        .dt.truncate("1h")
+        .alias("timestamp"),
+        pl.col("partKey").replace_strict(SENSOR_MAPPINGS).alias("room"),
+    )
+    schema = lf.collect_schema()
+    measurements = [
+        c
+        for c in schema.names()
+        if c not in ("sortKey", "partKey", "timestamp", "room")
+        and schema[c].is_numeric()
+    ]
+
+    # The columns depend on which measurements each sensor has, which is the
+    # only part of the plan that has to look at the data first
+    present = (
+        lf.group_by("room")
+        .agg(pl.col(c).is_not_null().any() for c in measurements)
+        .collect()
+    )
+    present = {row["room"]: row for row in present.iter_rows(named=True)}
+    columns = [
+        pl.col(c)
+        .filter(pl.col("room") == room)
+        .mean()
+        .alias(f"{SHORT_NAMES.get(c, c)}_{room}")
+        for room in SENSOR_MAPPINGS.values()
+        for c in measurements
+        if present.get(room, {}).get(c)
+    ]
+
+    # Every sensor covers each hour from its first to its last reading
+    hours = (
+        lf.group_by("room")
+        .agg(
+            pl.datetime_range(
+                pl.col("timestamp").min(), pl.col("timestamp").max(), "1h"
+            )
+        )
+        .explode("timestamp")
+        .select("timestamp")
+        .unique()
+    )
+    return hours.join(lf.group_by("timestamp").agg(columns), on="timestamp", how="left")
+
+
+def local_time(column, format):
+    return pl.col(column).str.to_datetime(format).dt.replace_time_zone(TZ)
+
+
+def process_open_meteo(lf):
+    rename_map = {
+        "cloud_cover (%)": "om_cloud_cover",
+        "temperature_2m (°C)": "om_temperature",
+        "relative_humidity_2m (%)": "om_humidity",
+        "rain (mm)": "om_rain",
+        "direct_radiation_instant (W/m²)": "om_radiation",
+    }
+    lf = lf.rename(rename_map).with_columns(local_time("time", "%Y-%m-%dT%H:%M"))
+    return hourly(lf, "time", [pl.col(c).mean() for c in rename_map.values()])
+
+
+def process_solar_pv(lf):
+    lf = lf.rename({"Energy [kWh]": "pv_energy", "Power [W]": "pv_power"})
+    lf = lf.with_columns(local_time("Datetime", "%Y-%m-%d %H:%M:%S"))
+    return hourly(
+        lf, "Datetime", [pl.col("pv_energy").sum(), pl.col("pv_power").mean()]
+    )
+
+
+def process_powerpal(lf):
+    lf = lf.rename({"watt_hours": "pp_energy"})
+    lf = lf.with_columns(local_time("datetime_local", "%Y-%m-%d %H:%M:%S"))
+    return hourly(lf, "datetime_local", [pl.col("pp_energy").sum()]).with_columns(
+        pl.col("pp_energy").fill_null(0)
+    )
+
+
+def process_synergy(lf):
+    lf = lf.rename(
+        {
+            "consumption_kWh": "synergy_consumption",
+            "generation_kWh": "synergy_production",
+        }
+    )
+    # Positive = Sending to grid (Export), Negative = Drawing from grid (Import)
+    return lf.with_columns(
+        local_time("timestamp", "%Y-%m-%d %H:%M:%S"),
+        (pl.col("synergy_production") - pl.col("synergy_consumption")).alias(
+            "synergy_net"
+        ),
+    )
+
+
+def min_max_normalize(column, bounds=None):
+    low, high = bounds if bounds else (pl.col(column).min(), pl.col(column).max())
+    return (
+        pl.when(high == low).then(0.0).otherwise((pl.col(column) - low) / (high - low))
+    )
+
+
+def add_ml_features(lf, bounds=None):
+    """Adds the same 'f_' features as pipeline.add_ml_features."""
+    names = lf.collect_schema().names()
+    lf = lf.with_columns(
+        min_max_normalize(column, bounds.get(column) if bounds else None).alias(feature)
+        for feature, column in NORMALIZED_FEATURES.items()
+        if column in names
+    )
+    hour = pl.col("timestamp").dt.hour()
+    lf = lf.with_columns(
+        (2 * np.pi * hour / 24).sin().alias("f_hour_sin"),
+        (2 * np.pi * hour / 24).cos().alias("f_hour_cos"),
+    )
+    if "temp_indoor" in names:
+        lf = lf.with_columns(
+            pl.col("f_temp_indoor").shift(n).alias(f"f_t_lag_{n}h") for n in (1, 2, 3)
+        )
+    if "temp_indoor" in names and "temp_outdoor" in names:
+        lf = lf.with_columns(
+            (pl.col("f_temp_indoor") - pl.col("f_temp_outdoor")).alias(
+                "f_indoor_outdoor_delta"
+            )
+        )
+    return lf
+
+
+def normalization_bounds(lf):
+    """Min and max of every normalized column, like feature_store.normalization_bounds."""
+    names = lf.collect_schema().names()
+    columns = [c for c in NORMALIZED_FEATURES.values() if c in names]
+    stats = lf.select(
+        [pl.col(c).min().alias(f"{c}_min") for c in columns]
+        + [pl.col(c).max().alias(f"{c}_max") for c in columns]
+    ).collect()
+    row = stats.row(0, named=True) if columns else {}
+    return {
+        c: [
+            np.nan if row[f"{c}_min"] is None else float(row[f"{c}_min"]),
+            np.nan if row[f"{c}_max"] is None else float(row[f"{c}_max"]),
+        ]
+        for c in columns
+    }
+
+
+def merge_sources(files):
+    """Builds the lazy plan of every source processed to hourly and joined on
+    the hour, before the features are added."""
+    frames = [process_dynamodb(scan_dynamodb(files["dynamo"]))]
+    for key, func in [
+        ("meteo", process_open_meteo),
+        ("solar", process_solar_pv),
+        ("powerpal", process_powerpal),
+        ("synergy", process_synergy),
+    ]:
+        if os.path.exists(files[key]):
+            frames.append(func(pl.scan_csv(files[key])))
+
+    # Final Alignment: an outer join on the hour, like pd.concat(axis=1)
+    merged = frames[0]
+    for frame in frames[1:]:
+        merged = merged.join(frame, on="timestamp", how="full", coalesce=True)
+    return merged.sort("timestamp")
+
+
+def finish_features(merged, bounds=None):
+    merged = add_ml_features(merged, bounds)
+
+    # Final Formatting for Perth/Singapore alignment
+    return merged.with_columns(
+        pl.col("timestamp").dt.strftime("%Y-%m-%d %H:00:00").alias("datetime_perth"),
+        pl.col("timestamp").dt.epoch("s").alias("epoch"),
+    )
+
+
+def build_pipeline(files, bounds=None):
+    """Builds the lazy plan of the whole pipeline, nothing is read until it's
+    collected or sunk. bounds are the feature store's normalization bounds."""
+    return finish_features(merge_sources(files), bounds)
+
+
+def run_pipeline(files, store_path=STORE_PATH):
+    """Like pipeline.run_pipeline, fits the normalization bounds on the whole
+    history and stores them in the feature store, so exports of both backends
+    use the same versions. Returns the lazy plan and the parameters.
+
+    Fitting the bounds reads the sources once before the plan itself runs.
+    """
+    merged = merge_sources(files)
+    params = save_params(normalization_bounds(merged), store_path)
+    return finish_features(merged, params["bounds"]), params
+
+
+if __name__ == "__main__":
+    plan, params = run_pipeline(files)
+    plan = plan.filter(
+        pl.col("timestamp").is_between(
+            pl.datetime(2025, 1, 1, time_zone=TZ),
+            pl.datetime(2025, 12, 8, 23, time_zone=TZ),
+        )
+    )
+    # The version is stored in the schema metadata where pandas keeps
+    # DataFrame.attrs, so pd.read_parquet gives the same attrs as the pandas export
+    schema = plan.collect_schema().to_arrow()
+    schema = schema.with_metadata(
+        {"PANDAS_ATTRS": json.dumps({"normalization_version": params["version"]})}
+    )
+    # Streams the result to Parquet, the frame is never fully built in Python
+    plan.sink_parquet("2025_export_polars.parquet", arrow_schema=schema)
+    print("Extraction complete for 2025 (Polars).")
+    print(f"Normalization parameters: version {params['version']}")
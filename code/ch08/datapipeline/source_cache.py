@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# Parsed CSV sources are cached here as Parquet files, named after the path
+# and the hash of the CSV, so a source is only parsed again when its file changes
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "source_cache")
+
+# Declared types of the columns of each source, so read_csv doesn't have to
+# infer them. The measurements end up in the export, so they stay float64 like
+# read_csv (and the Polars pipeline) would parse them.
+SOURCE_DTYPES = {
+    "dynamo": {
+        "partKey": "category",
+        # Exported as 1689316838696.0, float64 holds millisecond epochs exactly
+        "sortKey": "float64",
+        "temperature": "float64",
+        "humidity": "float64",
+        "tvoc": "float64",
+        "pm25": "float64",
+        "pm10": "float64",
+        "co2": "float64",
+        "presssure": "float64",
+        "energyConsumption": "float64",
+        "current": "float64",
+        "power": "float64",
+        "voltage": "float64",
+    },
+    "meteo": {
+        "cloud_cover (%)": "float64",
+        "temperature_2m (°C)": "float64",
+        "relative_humidity_2m (%)": "float64",
+        "rain (mm)": "float64",
+        "direct_radiation_instant (W/m²)": "float64",
+    },
+    # The output of data/cleanSolar.py
+    "solar": {
+        "Epoch": "int64",
+        "Energy [kWh]": "float64",
+        "Power [W]": "float64",
+        "Uac L1 [V]": "float64",
+        "Iac L1 [A]": "float64",
+        "Udc MPPT1[V]": "float64",
+        "Idc MPPT1[A]": "float64",
+        "Periode [s]": "float64",
+        "Energy [Ws]": "float64",
+    },
+    "powerpal": {
+        "watt_hours": "float64",
+        "cost_dollars": "float64",
+    },
+    "synergy": {
+        "consumption_kWh": "float64",
+        "generation_kWh": "float64",
+    },
+}
+
+# Columns parsed into datetimes while the CSV is read
+SOURCE_DATES = {
+    "meteo": ["time"],
+    "solar": ["Datetime"],
+    "powerpal": ["datetime_local"],
+    "synergy": ["timestamp"],
+}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_csv(source, path):
+    """Parses a CSV source with its declared column types."""
+    columns = pd.read_csv(path, nrows=0).columns
+    dtypes = SOURCE_DTYPES.get(source, {})
+    dates = [c for c in SOURCE_DATES.get(source, []) if c in columns]
+    return pd.read_csv(
+        path,
+        dtype={c: t for c, t in dtypes.items() if c in columns},
+        parse_dates=dates,
+        low_memory=False,
+    )
+
+
+def read_source(source, path, cache_path=CACHE_PATH):
+    """Reads a CSV source, from its cached Parquet file if it was parsed before.
+
+    Raises FileNotFoundError if the CSV doesn't exist.
+    """
+    # The declared types are part of the key, changing them parses the CSV again
+    spec = json.dumps([SOURCE_DTYPES.get(source), SOURCE_DATES.get(source)])
+    spec_hash = hashlib.blake2b(spec.encode(), digest_size=4).hexdigest()
+    key = f"{file_hash(path)}-{spec_hash}"
+    # Files with the same name in different directories are cached separately
+    stem = os.path.splitext(os.path.basename(path))[0]
+    path_hash = hashlib.blake2b(
+        os.path.abspath(path).encode(), digest_size=4
+    ).hexdigest()
+    prefix = f"{source}-{stem}-{path_hash}-"
+    cached = os.path.join(cache_path, f"{prefix}{key}.parquet")
+    if os.path.exists(cached):
+        return pd.read_parquet(cached, memory_map=True)
+
+    df = parse_csv(source, path)
+    os.makedirs(cache_path, exist_ok=True)
+    # Remove the cached versions of earlier contents of the file
+    for name in os.listdir(cache_path):
+        if name.startswith(prefix) and name.endswith(".parquet"):
+            os.remove(os.path.join(cache_path, name))
+    # Written under a temporary name first, so an interrupted run leaves no partial file
+    df.to_parquet(f"{cached}.tmp", index=False)
+    os.replace(f"{cached}.tmp", cached)
+    return df
@@ -0,0 +1,57 @@
+"""
+Benchmark of the vectorized Monte Carlo engine against the SimPy simulation
+
+Runs both engines for the same number of runs, compares the percentiles of the
+completion times and tests with a two sample Kolmogorov-Smirnov test that
+both are samples of the same distribution. Then times the vectorized engine
+for a much larger number of runs, spread over a pool of processes.
+"""
+
+import time
+
+from scipy.stats import ks_2samp
+
+from ch09_code06_biegel_montecarlo import (
+    percentiles_with_ci,
+    simulate_simpy,
+    simulate_vectorized,
+)
+
+N_RUNS = 20_000
+LARGE_N_RUNS = 10_000_000
+
+
+def timed(simulate, n_runs, seed):
+    start = time.perf_counter()
+    results = simulate(n_runs, seed)
+    return results, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    simpy_results, simpy_seconds = timed(simulate_simpy, N_RUNS, 1)
+    vectorized_results, vectorized_seconds = timed(simulate_vectorized, N_RUNS, 2)
+
+    print(f"{N_RUNS} runs")
+    print(f"  SimPy:      {simpy_seconds:8.3f}s")
+    print(
+        f"  vectorized: {vectorized_seconds:8.3f}s "
+        f"({simpy_seconds / vectorized_seconds:.0f}x faster)"
+    )
+
+    print(f"\n{'Percentile':<12}{'SimPy (95% CI)':<26}vectorized (95% CI)")
+    simpy_estimates = percentiles_with_ci(simpy_results)
+    vectorized_estimates = percentiles_with_ci(vectorized_results)
+    for p in simpy_estimates:
+        simpy_column, vectorized_column = (
+            f"{estimate:6.1f} ({low:6.1f} - {high:6.1f})"
+            for estimate, low, high in (simpy_estimates[p], vectorized_estimates[p])
+        )
+        print(f"  P{p:<8} {simpy_column:<26}{vectorized_column}")
+    ks = ks_2samp(simpy_results, vectorized_results)
+    print(f"\nKolmogorov-Smirnov: D={ks.statistic:.4f}, p={ks.pvalue:.2f}")
+    print("Same distribution" if ks.pvalue > 0.01 else "Distributions differ!")
+
+    large_results, large_seconds = timed(simulate_vectorized, LARGE_N_RUNS, 3)
+    print(f"\n{LARGE_N_RUNS} vectorized runs: {large_seconds:.1f}s")
+    for p, (estimate, low, high) in percentiles_with_ci(large_results).items():
+        print(f"  P{p}: {estimate:6.2f} min ({low:.2f} - {high:.2f})")
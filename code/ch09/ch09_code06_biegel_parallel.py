@@ -0,0 +1,168 @@
+"""
+Parallel Monte Carlo of the SimPy appliance simulation, with streaming percentiles
+
+The replications run in batches on a pool of processes, each batch with its
+own random stream spawned from one seed. Instead of returning every
+completion time, a batch returns a quantile sketch, so memory stays the same
+however many runs there are. The sketches are merged as batches finish, and
+the runs stop as soon as the confidence intervals of P50, P95 and P99 are
+narrow enough.
+"""
+
+import math
+import os
+import random
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import simpy
+
+from ch09_code06_biegel_montecarlo import (
+    APPLIANCES,
+    CONFIDENCE,
+    MAX_POWER,
+    MAX_WORKERS,
+    PERCENTILES,
+    appliance,
+    ci_ranks,
+)
+
+BATCH_SIZE = 2_000  # SimPy runs per task
+MIN_RUNS = 10_000
+MAX_RUNS = 10_000_000
+# Stop when every confidence interval is within this share of its estimate
+REL_TOLERANCE = 0.0025
+SKETCH_ACCURACY = 0.0005  # relative error of the sketch quantiles
+
+
+class QuantileSketch:
+    """Streaming quantiles with a relative accuracy (a DDSketch).
+
+    Values are counted in buckets with geometrically growing bounds, so its
+    size depends on the range of the values and not on how many there are,
+    and sketches of different processes merge by adding up their counts.
+    """
+
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.counts = Counter()
+        self.n = 0
+
+    def add(self, value):
+        self.counts[math.ceil(math.log(value) / self.log_gamma)] += 1
+        self.n += 1
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.n += other.n
+
+    def value_at_rank(self, rank):
+        """The rank-th smallest value (from 0), within the accuracy."""
+        total = 0
+        for index in sorted(self.counts):
+            total += self.counts[index]
+            if total > rank:
+                return 2 * self.gamma**index / (self.gamma + 1)
+        raise IndexError(rank)
+
+    def quantile(self, q):
+        return self.value_at_rank(q * (self.n - 1))
+
+
+def simulate_batch(n_runs, seed):
+    """Sketch of the completion times of n_runs SimPy simulations."""
+    rng = random.Random(seed)
+    sketch = QuantileSketch()
+    for _ in range(n_runs):
+        env = simpy.Environment()
+        grid = simpy.Container(env, capacity=MAX_POWER, init=MAX_POWER)
+        for name, power, avg_dur, std_dev in APPLIANCES:
+            env.process(appliance(env, name, power, avg_dur, std_dev, grid, rng))
+        env.run()
+        sketch.add(env.now)
+    return sketch
+
+
+def percentiles_with_ci(sketch, percentiles=PERCENTILES, confidence=CONFIDENCE):
+    """{percentile: (estimate, low, high)} of the sketch, with the confidence
+    intervals of ci_ranks."""
+    estimates = {}
+    for p in percentiles:
+        low, high = ci_ranks(sketch.n, p / 100, confidence)
+        estimates[p] = (
+            sketch.quantile(p / 100),
+            sketch.value_at_rank(low),
+            sketch.value_at_rank(high),
+        )
+    return estimates
+
+
+def converged(estimates, rel_tolerance=REL_TOLERANCE):
+    return all(
+        (high - low) / 2 <= rel_tolerance * estimate
+        for estimate, low, high in estimates.values()
+    )
+
+
+def run_parallel(
+    max_runs=MAX_RUNS,
+    seed=None,
+    max_workers=MAX_WORKERS,
+    batch_size=BATCH_SIZE,
+    min_runs=MIN_RUNS,
+    rel_tolerance=REL_TOLERANCE,
+):
+    """Runs SimPy batches until the percentiles converge or max_runs is reached.
+
+    Batches are merged in the order they were submitted, so a seed gives the
+    same result whatever the number of processes. Returns the merged sketch
+    and the percentiles with their confidence intervals.
+    """
+    seeds = np.random.SeedSequence(seed)
+    sketch = QuantileSketch()
+    estimates = {}
+    submitted = 0
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        # Two batches per process in flight keep them busy, without queueing
+        # up max_runs worth of tasks
+        pending = deque()
+
+        def submit():
+            nonlocal submitted
+            n_runs = min(batch_size, max_runs - submitted)
+            if n_runs > 0:
+                (child,) = seeds.spawn(1)
+                batch_seed = int(child.generate_state(1, np.uint64)[0])
+                pending.append(pool.submit(simulate_batch, n_runs, batch_seed))
+                submitted += n_runs
+
+        for _ in range(2 * (max_workers or os.cpu_count())):
+            submit()
+        while pending:
+            sketch.merge(pending.popleft().result())
+            estimates = percentiles_with_ci(sketch)
+            if sketch.n >= min_runs and converged(estimates, rel_tolerance):
+                break
+            submit()
+    finally:
+        # Returns without waiting for the batches still in flight: queued ones
+        # are cancelled, running ones finish in the background and are ignored
+        pool.shutdown(wait=False, cancel_futures=True)
+    return sketch, estimates
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    sketch, estimates = run_parallel(seed=42)
+    seconds = time.perf_counter() - start
+    print(
+        f"{sketch.n} SimPy runs in {seconds:.1f}s "
+        f"({len(sketch.counts)} sketch buckets)"
+    )
+    print(f"Completion time percentiles ({CONFIDENCE:.0%} CI):")
+    for p, (estimate, low, high) in estimates.items():
+        print(f"  P{p}: {estimate:6.1f} min ({low:.1f} - {high:.1f})")
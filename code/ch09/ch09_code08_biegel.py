@@ -17,6 +17,10 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from matplotlib.colors import Normalize
 from functools import partial
+from itertools import product
+from typing import NamedTuple
+
+from ch09_code08_biegel_pressure import SOLVERS
 
 # Enable 64-bit precision for better numerical stability
 jax.config.update("jax_enable_x64", True)
@@ -55,13 +59,40 @@ AC_Y_POS = NY - 2  # Near ceiling
 # AC outlet velocity (m/s)
 AC_VELOCITY = -0.5  # Downward flow
 
+# Pressure solver (see ch09_code08_biegel_pressure.py): "jacobi", the scheme
+# the chapter describes, or one of the faster "sor", "multigrid" and "dct".
+# The iterative ones stop at a relative residual of PRESSURE_TOLERANCE, or
+# after PRESSURE_MAX_ITERATIONS sweeps (V-cycles for multigrid) per time step
+PRESSURE_SOLVER = "jacobi"
+PRESSURE_TOLERANCE = 1e-6
+PRESSURE_MAX_ITERATIONS = 500
+
+# Comfort metric: the share of the occupied zone (up to head height) that is
+# within the comfortable temperature range
+OCCUPIED_HEIGHT = 1.8  # meters
+COMFORT_RANGE = (20.0, 24.0)  # Celsius
+
+
+class RoomParams(NamedTuple):
+    """Parameters of a scenario. A NamedTuple is a JAX pytree, so the fields can
+    be arrays with one value per scenario, which jax.vmap runs as a batch."""
+
+    ac_velocity: float = AC_VELOCITY
+    ac_temperature: float = T_AC_OUTLET
+    ac_x_start: int = AC_X_START  # grid index
+    ac_width: int = AC_X_END - AC_X_START  # grid cells
+    initial_temperature: float = T_INITIAL
+
+
+DEFAULT_PARAMS = RoomParams()
+
 
 # =============================================================================
 # Core CFD Functions
 # =============================================================================
 
 
-def create_initial_conditions():
+def create_initial_conditions(params=DEFAULT_PARAMS):
     """Initialize velocity and temperature fields."""
     # Velocity components (u, v) - start at rest
     u = jnp.zeros((NY, NX))
@@ -71,12 +102,23 @@ def create_initial_conditions():
     p = jnp.zeros((NY, NX))
 
     # Temperature field - uniform initial temperature
-    T = jnp.ones((NY, NX)) * T_INITIAL
+    T = jnp.ones((NY, NX)) * params.initial_temperature
 
     return u, v, p, T
 
 
-def apply_boundary_conditions(u, v, T):
+def ac_outlet(params):
+    """Mask of the grid points of the AC outlet."""
+    rows = jnp.arange(NY)[:, None]
+    cols = jnp.arange(NX)
+    return (
+        (rows == AC_Y_POS)
+        & (cols >= params.ac_x_start)
+        & (cols < params.ac_x_start + params.ac_width)
+    )
+
+
+def apply_boundary_conditions(u, v, T, params=DEFAULT_PARAMS):
     """Apply boundary conditions for walls and AC unit."""
     # Wall boundaries (no-slip for velocity)
     # Bottom wall
@@ -97,9 +139,10 @@ def apply_boundary_conditions(u, v, T):
 
     # AC unit boundary conditions (inlet)
     # Cold air blowing downward from AC
-    u = u.at[AC_Y_POS, AC_X_START:AC_X_END].set(0.0)
-    v = v.at[AC_Y_POS, AC_X_START:AC_X_END].set(AC_VELOCITY)
-    T = T.at[AC_Y_POS, AC_X_START:AC_X_END].set(T_AC_OUTLET)
+    ac = ac_outlet(params)
+    u = jnp.where(ac, 0.0, u)
+    v = jnp.where(ac, params.ac_velocity, v)
+    T = jnp.where(ac, params.ac_temperature, T)
 
     # Adiabatic walls (no heat flux through walls)
     T = T.at[0, :].set(T[1, :])  # Bottom
@@ -108,7 +151,7 @@ def apply_boundary_conditions(u, v, T):
     T = T.at[:, -1].set(T[:, -2])  # Right
 
     # Re-apply AC temperature after adiabatic condition
-    T = T.at[AC_Y_POS, AC_X_START:AC_X_END].set(T_AC_OUTLET)
+    T = jnp.where(ac, params.ac_temperature, T)
 
     return u, v, T
 
@@ -131,26 +174,16 @@ def laplacian(field, dx, dy):
     return d2fdx2 + d2fdy2
 
 
-def pressure_poisson(p, div_velocity, n_iterations=50):
-    """Solve pressure Poisson equation using Jacobi iteration."""
+def pressure_poisson(
+    p,
+    div_velocity,
+    solver=PRESSURE_SOLVER,
+    tol=PRESSURE_TOLERANCE,
+    max_iterations=PRESSURE_MAX_ITERATIONS,
+):
+    """Solve pressure Poisson equation, starting from the previous pressure."""
     rhs = div_velocity / DT
-
-    def jacobi_step(p, _):
-        p_new = (
-            (jnp.roll(p, 1, axis=1) + jnp.roll(p, -1, axis=1)) / DX**2
-            + (jnp.roll(p, 1, axis=0) + jnp.roll(p, -1, axis=0)) / DY**2
-            - rhs
-        ) / (2 / DX**2 + 2 / DY**2)
-
-        # Neumann boundary conditions for pressure
-        p_new = p_new.at[0, :].set(p_new[1, :])
-        p_new = p_new.at[-1, :].set(p_new[-2, :])
-        p_new = p_new.at[:, 0].set(p_new[:, 1])
-        p_new = p_new.at[:, -1].set(p_new[:, -2])
-
-        return p_new, None
-
-    p, _ = jax.lax.scan(jacobi_step, p, None, length=n_iterations)
+    p, _, _ = SOLVERS[solver](p, rhs, DX, DY, tol=tol, max_iterations=max_iterations)
     return p
 
 
@@ -170,10 +203,10 @@ def advection_term(field, u, v):
 
 
 @jax.jit
-def simulation_step(state):
+def simulation_step(state, params=DEFAULT_PARAMS):
     """One timestep using projection method with thermal coupling."""
     u, v, p, T = state
-    u, v, T = apply_boundary_conditions(u, v, T)
+    u, v, T = apply_boundary_conditions(u, v, T, params)
 
     # Predictor: advection + diffusion (no pressure)
     u_star = u + DT * (-advection_term(u, u, v) + NU * laplacian(u, DX, DY))
@@ -192,22 +225,114 @@ def simulation_step(state):
     T_new = T + DT * (-advection_term(T, u, v) + ALPHA * laplacian(T, DX, DY))
 
     # Final boundary conditions
-    u_new, v_new, T_new = apply_boundary_conditions(u_new, v_new, T_new)
+    u_new, v_new, T_new = apply_boundary_conditions(u_new, v_new, T_new, params)
 
     return (u_new, v_new, p, T_new)
 
 
+# =============================================================================
+# Batched Scenarios
+# =============================================================================
+
+
+def comfort(T):
+    """Share of the occupied zone within COMFORT_RANGE, and its mean temperature."""
+    rows = int(OCCUPIED_HEIGHT / DY)
+    occupied = T[1:rows, 1:-1]
+    low, high = COMFORT_RANGE
+    return jnp.mean((occupied >= low) & (occupied <= high)), jnp.mean(occupied)
+
+
+def make_param_grid(**values):
+    """Every combination of the given values of RoomParams fields, e.g.
+    make_param_grid(ac_temperature=[16, 18], ac_x_start=[5, 45]) is 4 scenarios.
+    The other fields keep their default value."""
+    names = list(values)
+    combinations = list(product(*values.values()))
+    return RoomParams(
+        **{
+            field: jnp.array(
+                [c[names.index(field)] for c in combinations]
+                if field in values
+                else [default] * len(combinations)
+            )
+            for field, default in DEFAULT_PARAMS._asdict().items()
+        }
+    )
+
+
+@partial(jax.jit, static_argnames="n_steps")
+def run_scenarios(param_grid, n_steps):
+    """Runs every scenario of param_grid (RoomParams of arrays, see
+    make_param_grid) for n_steps as one batched kernel.
+
+    Returns the final temperature field of each scenario, the share of its
+    occupied zone within COMFORT_RANGE and the mean temperature there.
+    """
+
+    def run(params):
+        state = jax.lax.fori_loop(
+            0,
+            n_steps,
+            lambda _, state: simulation_step(state, params),
+            create_initial_conditions(params),
+        )
+        T = state[3]
+        comfortable, mean_temperature = comfort(T)
+        return {
+            "temperature": T,
+            "comfort": comfortable,
+            "mean_temperature": mean_temperature,
+        }
+
+    return jax.vmap(run)(param_grid)
+
+
+# =============================================================================
+# Headless Runs
+# =============================================================================
+
+
+@partial(jax.jit, static_argnames=("n_snapshots", "snapshot_every", "stride"))
+def rollout(state, n_snapshots, snapshot_every, stride=1, params=DEFAULT_PARAMS):
+    """Advances n_snapshots * snapshot_every steps in one lax.scan, without
+    going back to Python between steps.
+
+    Returns the final state and the (u, v, p, T) fields after every
+    snapshot_every steps, at every stride-th grid point, as float32 arrays
+    with a leading snapshot axis.
+    """
+
+    def advance(state, _):
+        state = jax.lax.fori_loop(
+            0, snapshot_every, lambda _, state: simulation_step(state, params), state
+        )
+        return state, tuple(f[::stride, ::stride].astype(jnp.float32) for f in state)
+
+    return jax.lax.scan(advance, state, length=n_snapshots)
+
+
 # =============================================================================
 # Visualization
 # =============================================================================
 
 
-def create_visualization():
-    """Create animated visualization of the cooling simulation."""
-    print("Initializing simulation...")
+def create_visualization(store=None):
+    """Create animated visualization of the cooling simulation.
 
-    # Initialize fields
-    state = create_initial_conditions()
+    Without a store the simulation runs while the frames are drawn. A store
+    (see load_store in ch09_code08_biegel_headless.py) renders the snapshots
+    of a headless run instead, one frame per snapshot.
+    """
+    if store is None:
+        print("Initializing simulation...")
+
+        # Initialize fields
+        state = create_initial_conditions()
+        frames = 300
+    else:
+        state = tuple(store[name][0] for name in ("u", "v", "p", "T"))
+        frames = len(store["time"])
 
     # Create figure with subplots
     fig, axes = plt.subplots(1, 2, figsize=(14, 5))
@@ -215,9 +340,10 @@ def create_visualization():
         "Air Conditioner Room Cooling Simulation", fontsize=14, fontweight="bold"
     )
 
-    # Create coordinate grids for plotting
-    x = np.linspace(0, ROOM_WIDTH, NX)
-    y = np.linspace(0, ROOM_HEIGHT, NY)
+    # Create coordinate grids for plotting (snapshots may be subsampled)
+    ny, nx = state[3].shape
+    x = np.linspace(0, ROOM_WIDTH, nx)
+    y = np.linspace(0, ROOM_HEIGHT, ny)
     X, Y = np.meshgrid(x, y)
 
     # Temperature plot
@@ -271,7 +397,7 @@ def create_visualization():
     cbar2 = plt.colorbar(speed_plot, ax=ax2, label="Velocity magnitude (m/s)")
 
     # Add quiver plot for velocity direction
-    skip = 4
+    skip = max(1, round(4 * nx / NX))
     quiver = ax2.quiver(
         X[::skip, ::skip],
         Y[::skip, ::skip],
@@ -323,11 +449,15 @@ def create_visualization():
         steps_per_frame = 40
         # --- MODIFICATION END ---
 
-        for _ in range(steps_per_frame):
-            state_holder["state"] = simulation_step(state_holder["state"])
-            state_holder["step"] += 1
-
-        u, v, p, T = state_holder["state"]
+        if store is None:
+            for _ in range(steps_per_frame):
+                state_holder["state"] = simulation_step(state_holder["state"])
+                state_holder["step"] += 1
+            u, v, p, T = state_holder["state"]
+            sim_time = state_holder["step"] * DT
+        else:
+            u, v, p, T = (store[name][frame] for name in ("u", "v", "p", "T"))
+            sim_time = store["time"][frame]
 
         # Update temperature plot
         T_np = np.array(T)
@@ -343,7 +473,6 @@ def create_visualization():
         quiver.set_UVC(u_np[::skip, ::skip], v_np[::skip, ::skip])
 
         # Update time and average temperature display
-        sim_time = state_holder["step"] * DT
         avg_temp = float(jnp.mean(T))
         time_text.set_text(
             f"Time: {sim_time:.1f}s\n"
@@ -362,7 +491,7 @@ def create_visualization():
     # --- MODIFICATION START ---
     # Increased total frames
     # 300 frames * 0.2s sim time/frame = 60.0 seconds total simulated time
-    ani = animation.FuncAnimation(fig, update, frames=300, interval=50, blit=False)
+    ani = animation.FuncAnimation(fig, update, frames=frames, interval=50, blit=False)
     # --- MODIFICATION END ---
 
     return fig, ani
@@ -0,0 +1,63 @@
+"""
+Benchmark of the pressure solvers of the CFD room simulation
+
+Solves the pressure Poisson equation from a zero initial pressure (the worst
+case, in the simulation each step starts from the previous pressure) to a
+relative residual of TOLERANCE, at several grid resolutions, and reports the
+time to the tolerance of each solver on the CPU.
+"""
+
+import os
+import time
+from functools import partial
+
+# Benchmark on the CPU, even if JAX could use a GPU
+os.environ.setdefault("JAX_PLATFORMS", "cpu")
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from ch09_code08_biegel_pressure import SOLVERS
+
+jax.config.update("jax_enable_x64", True)
+
+# The room of ch09_code08_biegel.py
+ROOM_WIDTH = 5.0
+ROOM_HEIGHT = 3.0
+
+# NX x NY grids, the default grid of the simulation and grids with 2^n interior
+# cells, which multigrid can halve all the way down
+RESOLUTIONS = [(100, 60), (130, 66), (258, 130), (514, 258)]
+TOLERANCE = 1e-6
+REPEATS = 3
+
+
+def time_to_tolerance(solver, p, rhs, dx, dy):
+    solve = jax.jit(partial(solver, dx=dx, dy=dy, tol=TOLERANCE))
+    jax.block_until_ready(solve(p, rhs))  # compile
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = jax.block_until_ready(solve(p, rhs))
+        times.append(time.perf_counter() - start)
+    _, iterations, residual = result
+    return min(times), int(iterations), float(residual)
+
+
+if __name__ == "__main__":
+    print(f"JAX backend: {jax.default_backend()}, tolerance: {TOLERANCE}")
+    print(f"{'grid':>9} {'solver':>10} {'time (ms)':>10} {'iterations':>11} residual")
+    rng = np.random.default_rng(42)
+    for nx, ny in RESOLUTIONS:
+        dx, dy = ROOM_WIDTH / nx, ROOM_HEIGHT / ny
+        # Random divergence has every frequency, slow ones for iterative solvers too
+        rhs = jnp.asarray(rng.normal(size=(ny, nx)))
+        p = jnp.zeros((ny, nx))
+        for name, solver in SOLVERS.items():
+            seconds, iterations, residual = time_to_tolerance(solver, p, rhs, dx, dy)
+            note = "" if residual <= TOLERANCE else " (not converged)"
+            print(
+                f"{nx:>4}x{ny:<4} {name:>10} {seconds * 1000:>10.1f} "
+                f"{iterations:>11} {residual:.1e}{note}"
+            )
@@ -0,0 +1,162 @@
+"""
+Headless runs of the CFD room simulation, with the fields saved to disk
+
+Instead of calling simulation_step from Python for every time step (and
+copying the fields back for every animation frame), rollout advances a chunk
+of snapshots at a time in one compiled lax.scan. The snapshots of u, v, p and
+T are written to memory-mapped .npy files, one per field with the shape
+(snapshot, y, x), so long runs don't have to fit in memory. The animation is
+rendered afterwards from the files, without running the simulation again.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import jax
+import matplotlib.pyplot as plt
+import numpy as np
+
+from ch09_code08_biegel import (
+    DEFAULT_PARAMS,
+    DT,
+    create_initial_conditions,
+    create_visualization,
+    rollout,
+    simulation_step,
+)
+
+STORE_PATH = "ac_cooling_store"
+GIF_PATH = "ac_cooling_animation.gif"
+FIELDS = ("u", "v", "p", "T")
+
+SNAPSHOT_EVERY = 40  # steps, 0.2s of simulated time, one animation frame
+CHUNK_SNAPSHOTS = 50  # snapshots per compiled call, held in memory at once
+
+
+def write_store(
+    path,
+    seconds,
+    snapshot_every=SNAPSHOT_EVERY,
+    stride=1,
+    chunk_snapshots=CHUNK_SNAPSHOTS,
+    params=DEFAULT_PARAMS,
+):
+    """Simulates seconds of cooling and writes a snapshot every snapshot_every
+    steps (every stride-th grid point) to the store at path.
+
+    Returns the number of snapshots, including the initial conditions.
+    """
+    n_snapshots = int(round(seconds / DT)) // snapshot_every
+    state = create_initial_conditions(params)
+    shape = (n_snapshots + 1,) + state[0][::stride, ::stride].shape
+
+    os.makedirs(path, exist_ok=True)
+    store = {
+        name: np.lib.format.open_memmap(
+            os.path.join(path, f"{name}.npy"),
+            mode="w+",
+            dtype=np.float32,
+            shape=shape,
+        )
+        for name in FIELDS
+    }
+    for name, field in zip(FIELDS, state):
+        store[name][0] = field[::stride, ::stride]
+
+    def write(start, fields):
+        for name, field in zip(FIELDS, fields):
+            store[name][start + 1 : start + 1 + len(field)] = field
+        print(f"  t={(start + len(fields[0])) * snapshot_every * DT:.1f}s written")
+
+    # JAX dispatches asynchronously, so the next chunk is computed while the
+    # previous one is written to disk
+    pending = None
+    for start in range(0, n_snapshots, chunk_snapshots):
+        n = min(chunk_snapshots, n_snapshots - start)
+        state, fields = rollout(state, n, snapshot_every, stride, params)
+        if pending:
+            write(*pending)
+        pending = (start, fields)
+    if pending:
+        write(*pending)
+
+    for array in store.values():
+        array.flush()
+    metadata = {
+        "dt": DT,
+        "snapshot_every": snapshot_every,
+        "stride": stride,
+        "params": {k: np.asarray(v).item() for k, v in params._asdict().items()},
+    }
+    with open(os.path.join(path, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return n_snapshots + 1
+
+
+def load_store(path):
+    """Opens the fields of a store read-only, without loading them into memory.
+
+    Returns a dict with an array per field, the simulated time of each
+    snapshot and the metadata of the run.
+    """
+    with open(os.path.join(path, "metadata.json")) as f:
+        metadata = json.load(f)
+    store = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in FIELDS
+    }
+    snapshot_seconds = metadata["snapshot_every"] * metadata["dt"]
+    store["time"] = np.arange(len(store["T"])) * snapshot_seconds
+    store["metadata"] = metadata
+    return store
+
+
+def render_animation(path, gif_path=GIF_PATH):
+    fig, ani = create_visualization(load_store(path))
+    ani.save(gif_path, writer="pillow", fps=20)
+    plt.close(fig)
+    return gif_path
+
+
+def time_per_step_dispatch(n_steps):
+    """Seconds to run n_steps with one call from Python per step."""
+    state = jax.block_until_ready(simulation_step(create_initial_conditions()))
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        state = simulation_step(state)
+    jax.block_until_ready(state)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--stride", type=int, default=1, help="save every n-th point")
+    parser.add_argument("--store", default=STORE_PATH)
+    parser.add_argument(
+        "--render-only", action="store_true", help="render an existing store"
+    )
+    parser.add_argument(
+        "--compare", action="store_true", help="also time one call per step"
+    )
+    args = parser.parse_args()
+
+    if not args.render_only:
+        print(f"JAX backend: {jax.default_backend()}")
+        print(f"Simulating {args.seconds:.0f}s to {args.store}...")
+        start = time.perf_counter()
+        n_snapshots = write_store(args.store, args.seconds, stride=args.stride)
+        seconds = time.perf_counter() - start
+        n_steps = (n_snapshots - 1) * SNAPSHOT_EVERY
+        print(
+            f"{n_steps} steps, {n_snapshots} snapshots in {seconds:.1f}s "
+            f"(including compilation)"
+        )
+        if args.compare:
+            dispatch = time_per_step_dispatch(n_steps)
+            print(f"One call per step: {dispatch:.1f}s")
+
+    print(f"Rendering {args.store}...")
+    print(f"Animation saved to: {render_animation(args.store)}")
@@ -0,0 +1,227 @@
+"""
+Pressure solvers for the CFD room simulation (ch09_code08_biegel.py)
+
+Every solver solves the pressure Poisson equation laplacian(p) = rhs on the
+interior of the grid, with Neumann boundary conditions (the boundary rows and
+columns copy their neighbors, no pressure gradient through the walls):
+- jacobi:    Jacobi iteration until the residual is below the tolerance
+- sor:       red-black Gauss-Seidel with over-relaxation (SOR)
+- multigrid: V-cycles of red-black Gauss-Seidel on coarser and coarser grids
+- dct:       direct solve with a discrete cosine transform, which turns the
+             Laplacian of a rectangular room into a division per frequency
+
+The iterative solvers start from the previous pressure field, which is
+already close in a time stepping simulation, and stop as soon as
+||rhs - laplacian(p)|| <= tol * ||rhs||.
+"""
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+from jax.scipy.fft import dctn, idctn
+
+
+def with_boundary(x):
+    """Adds the Neumann boundary rows and columns around the interior."""
+    return jnp.pad(x, 1, mode="edge")
+
+
+def neighbors(x, dx, dy):
+    """Sum of the neighbors of each interior point, weighted by 1/dx^2 and 1/dy^2."""
+    xp = with_boundary(x)
+    return (xp[1:-1, 2:] + xp[1:-1, :-2]) / dx**2 + (
+        xp[2:, 1:-1] + xp[:-2, 1:-1]
+    ) / dy**2
+
+
+def laplacian(x, dx, dy):
+    return neighbors(x, dx, dy) - (2 / dx**2 + 2 / dy**2) * x
+
+
+def residual_norm(x, f, dx, dy):
+    return jnp.linalg.norm(f - laplacian(x, dx, dy))
+
+
+def compatible(rhs):
+    """Interior of the right hand side, without its mean.
+
+    With Neumann boundaries the pressure is only defined up to a constant, and
+    the equation only has a solution if the right hand side sums to zero.
+    """
+    f = rhs[1:-1, 1:-1]
+    return f - jnp.mean(f)
+
+
+def scale(f):
+    """||f||, or 1 if f is zero (e.g. a fluid at rest), which makes the
+    tolerance and the returned residual absolute instead of relative."""
+    norm = jnp.linalg.norm(f)
+    return jnp.where(norm > 0, norm, 1.0)
+
+
+def iterate(sweep, x, f, dx, dy, tol, max_iterations, check_every):
+    """Runs sweeps (check_every at a time) until the residual is below tol."""
+    target = tol * scale(f)
+
+    def not_converged(carry):
+        x, iterations, residual = carry
+        return (iterations < max_iterations) & (residual > target)
+
+    def sweeps(carry):
+        x, iterations, _ = carry
+        x = jax.lax.fori_loop(0, check_every, lambda _, x: sweep(x), x)
+        return x, iterations + check_every, residual_norm(x, f, dx, dy)
+
+    x, iterations, residual = jax.lax.while_loop(
+        not_converged, sweeps, (x, 0, residual_norm(x, f, dx, dy))
+    )
+    return x, iterations, residual / scale(f)
+
+
+def jacobi(p, rhs, dx, dy, tol=1e-6, max_iterations=20000, check_every=10):
+    """Jacobi iteration, with a residual based stop."""
+    f = compatible(rhs)
+    diagonal = 2 / dx**2 + 2 / dy**2
+
+    def sweep(x):
+        return (neighbors(x, dx, dy) - f) / diagonal
+
+    x, iterations, residual = iterate(
+        sweep, p[1:-1, 1:-1], f, dx, dy, tol, max_iterations, check_every
+    )
+    return with_boundary(x), iterations, residual
+
+
+def red_black_masks(shape):
+    rows, cols = np.indices(shape)
+    red = (rows + cols) % 2 == 0
+    return jnp.asarray(red), jnp.asarray(~red)
+
+
+def red_black_sweep(x, f, dx, dy, omega, masks):
+    """One red-black Gauss-Seidel sweep, over-relaxed by omega."""
+    diagonal = 2 / dx**2 + 2 / dy**2
+    for mask in masks:
+        gauss_seidel = (neighbors(x, dx, dy) - f) / diagonal
+        x = jnp.where(mask, x + omega * (gauss_seidel - x), x)
+    return x
+
+
+def optimal_omega(shape, dx, dy):
+    """Optimal SOR relaxation factor for the 5 point Laplacian on this grid."""
+    ny, nx = shape
+    rho = (np.cos(np.pi / nx) / dx**2 + np.cos(np.pi / ny) / dy**2) / (
+        1 / dx**2 + 1 / dy**2
+    )
+    return 2 / (1 + np.sqrt(1 - rho**2))
+
+
+def sor(p, rhs, dx, dy, tol=1e-6, max_iterations=20000, check_every=10, omega=None):
+    """Red-black SOR, omega=1 is red-black Gauss-Seidel."""
+    f = compatible(rhs)
+    x = p[1:-1, 1:-1]
+    masks = red_black_masks(x.shape)
+    omega = optimal_omega(x.shape, dx, dy) if omega is None else omega
+
+    def sweep(x):
+        return red_black_sweep(x, f, dx, dy, omega, masks)
+
+    x, iterations, residual = iterate(
+        sweep, x, f, dx, dy, tol, max_iterations, check_every
+    )
+    return with_boundary(x), iterations, residual
+
+
+def dct_solve(f, dx, dy):
+    """Solves laplacian(x) = f with a type 2 discrete cosine transform.
+
+    The cosines are the eigenvectors of the Laplacian with Neumann boundaries,
+    so each frequency is divided by its eigenvalue. The zero frequency (the
+    mean, which the equation doesn't define) is set to 0.
+    """
+    ny, nx = f.shape
+    eigenvalues = (2 * jnp.cos(jnp.pi * jnp.arange(nx) / nx) - 2) / dx**2 + (
+        2 * jnp.cos(jnp.pi * jnp.arange(ny) / ny)[:, None] - 2
+    ) / dy**2
+    f_hat = dctn(f, type=2, norm="ortho") / eigenvalues.at[0, 0].set(1.0)
+    return idctn(f_hat.at[0, 0].set(0.0), type=2, norm="ortho")
+
+
+def restrict(r):
+    """Averages 2x2 blocks of fine cells into one coarse cell."""
+    ny, nx = r.shape
+    return r.reshape(ny // 2, 2, nx // 2, 2).mean(axis=(1, 3))
+
+
+def prolong(e):
+    """Interpolates the coarse cells bilinearly to the fine cells.
+
+    Each fine cell is 3/4 of its coarse cell plus 1/4 of the coarse cell next
+    to it, in both directions.
+    """
+    for axis in (0, 1):
+        n = e.shape[axis]
+        ep = jnp.pad(e, [(1, 1) if a == axis else (0, 0) for a in (0, 1)], "edge")
+        center, before, after = (
+            jax.lax.slice_in_dim(ep, start, start + n, axis=axis) for start in (1, 0, 2)
+        )
+        fine = jnp.stack(
+            [0.75 * center + 0.25 * before, 0.75 * center + 0.25 * after],
+            axis=axis + 1,
+        )
+        e = fine.reshape(e.shape[:axis] + (2 * n,) + e.shape[axis + 1 :])
+    return e
+
+
+def smooth(x, f, dx, dy, sweeps):
+    masks = red_black_masks(x.shape)
+    return jax.lax.fori_loop(
+        0, sweeps, lambda _, x: red_black_sweep(x, f, dx, dy, 1.0, masks), x
+    )
+
+
+def v_cycle(x, f, dx, dy, pre_sweeps=2, post_sweeps=2, coarsest=8):
+    """One multigrid V-cycle: smooth, solve for the error on a grid with half
+    the cells, correct and smooth again.
+
+    Grids are halved until they are small or have an odd number of cells,
+    which are solved directly with dct_solve. The levels are unrolled when
+    it's traced, so the grid sizes are fixed at compile time.
+    """
+    ny, nx = x.shape
+    if min(ny, nx) <= coarsest or ny % 2 or nx % 2:
+        return dct_solve(f, dx, dy)
+    x = smooth(x, f, dx, dy, pre_sweeps)
+    r = restrict(f - laplacian(x, dx, dy))
+    e = v_cycle(jnp.zeros_like(r), r - jnp.mean(r), 2 * dx, 2 * dy)
+    x = x + prolong(e)
+    return smooth(x, f, dx, dy, post_sweeps)
+
+
+def multigrid(p, rhs, dx, dy, tol=1e-6, max_iterations=100, check_every=1):
+    """Multigrid V-cycles, iterations counts the cycles."""
+    f = compatible(rhs)
+
+    def sweep(x):
+        return v_cycle(x, f, dx, dy)
+
+    x, iterations, residual = iterate(
+        sweep, p[1:-1, 1:-1], f, dx, dy, tol, max_iterations, check_every
+    )
+    return with_boundary(x), iterations, residual
+
+
+def dct(p, rhs, dx, dy, tol=None, max_iterations=None):
+    """Direct solve, the mean pressure is kept from p."""
+    f = compatible(rhs)
+    x = dct_solve(f, dx, dy) + jnp.mean(p[1:-1, 1:-1])
+    return with_boundary(x), 1, residual_norm(x, f, dx, dy) / scale(f)
+
+
+# Solvers by name, each returns (pressure, iterations, relative residual)
+SOLVERS = {
+    "jacobi": jacobi,
+    "sor": sor,
+    "multigrid": multigrid,
+    "dct": dct,
+}
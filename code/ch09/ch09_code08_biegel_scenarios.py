@@ -0,0 +1,53 @@
+"""
+Compare AC setpoints, fan speeds and positions with batched CFD runs
+
+Every combination of the values below is a scenario. All scenarios are run
+with jax.vmap as one batched JIT-compiled simulation, instead of re-running
+ch09_code08_biegel.py once per configuration.
+"""
+
+import time
+
+import jax
+
+from ch09_code08_biegel import (
+    COMFORT_RANGE,
+    DT,
+    DX,
+    OCCUPIED_HEIGHT,
+    make_param_grid,
+    run_scenarios,
+)
+
+SIMULATED_SECONDS = 60.0
+
+if __name__ == "__main__":
+    param_grid = make_param_grid(
+        ac_temperature=[16.0, 18.0, 20.0],  # Celsius
+        ac_velocity=[-0.5, -1.0],  # m/s, downward
+        ac_x_start=[5, 45, 85],  # grid index of the left edge of the AC unit
+    )
+    n_scenarios = len(param_grid.ac_temperature)
+    n_steps = int(SIMULATED_SECONDS / DT)
+
+    print(f"Running {n_scenarios} scenarios for {SIMULATED_SECONDS:.0f}s each...")
+    start = time.perf_counter()
+    results = jax.block_until_ready(run_scenarios(param_grid, n_steps))
+    print(f"Done in {time.perf_counter() - start:.1f}s (including compilation)\n")
+
+    low, high = COMFORT_RANGE
+    print(f"Comfort: share of the room below {OCCUPIED_HEIGHT}m within {low}-{high}°C")
+    print(
+        f"{'AC temp':>8} {'velocity':>9} {'AC at (m)':>10} {'comfort':>8} {'mean':>7}"
+    )
+    ranking = sorted(
+        range(n_scenarios), key=lambda i: float(results["comfort"][i]), reverse=True
+    )
+    for i in ranking:
+        print(
+            f"{float(param_grid.ac_temperature[i]):>6.1f}°C "
+            f"{float(param_grid.ac_velocity[i]):>7.1f}m/s "
+            f"{int(param_grid.ac_x_start[i]) * DX:>9.2f} "
+            f"{float(results['comfort'][i]):>8.0%} "
+            f"{float(results['mean_temperature'][i]):>5.1f}°C"
+        )